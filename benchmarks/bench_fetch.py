@@ -0,0 +1,219 @@
+"""
+End-to-end benchmark of fetch_and_buffer_data against the local OpenF1 stand-in server
+(no public API, no Snowflake). Every scenario runs in a fresh process, so the peak RSS
+is per scenario; the server runs in the parent process.
+
+Reports rows/s, peak RSS, API calls/retries (client side) and HTTP statuses (server side).
+With --baseline, scenarios whose rows/s dropped by more than --tolerance fail the run (exit code 1).
+
+Usage:
+    python -m benchmarks.bench_fetch [--scenario car_data_concurrent ...] [--repeat 1]
+        [--output results.json] [--baseline results.json] [--tolerance 0.2]
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import tempfile
+import time
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from benchmarks.stand_in_server import DRIVERS, StandInServer
+
+# Scenariusze: parametry zapytań, ustawienia serwera i argumenty fetch_and_buffer_data
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "car_data_concurrent": {
+        "method": "car_data", "sessions": 2, "minutes": 10,
+        "server": {"latency_ms": 20, "jitter_ms": 20},
+        "fetch": {"fetch_mode": "concurrent", "max_workers": 8, "sink": "null"}
+    },
+    "car_data_columnar_compact": {
+        "method": "car_data", "sessions": 2, "minutes": 10,
+        "server": {"latency_ms": 20, "jitter_ms": 20},
+        "fetch": {"fetch_mode": "concurrent", "max_workers": 8, "sink": "null", "columnar_decode": True, "compact_schema": True}
+    },
+    "car_data_write_behind_parquet": {
+        "method": "car_data", "sessions": 2, "minutes": 10,
+        "server": {"latency_ms": 20, "jitter_ms": 20},
+        "fetch": {"fetch_mode": "concurrent", "max_workers": 8, "sink": "parquet", "writer_threads": 1}
+    },
+    "car_data_adaptive": {
+        "method": "car_data", "sessions": 2, "minutes": 10,
+        "server": {"latency_ms": 20, "jitter_ms": 20},
+        "fetch": {"fetch_mode": "concurrent", "max_workers": 8, "sink": "null", "adaptive_slicing": True}
+    },
+    "car_data_flaky": {
+        "method": "car_data", "sessions": 1, "minutes": 10,
+        "server": {"latency_ms": 20, "jitter_ms": 20, "error_rate": 0.02, "empty_rate": 0.02},
+        "fetch": {"fetch_mode": "concurrent", "max_workers": 8, "sink": "null"}
+    },
+    "car_data_throttled": {
+        "method": "car_data", "sessions": 1, "minutes": 10,
+        "server": {"latency_ms": 20, "jitter_ms": 20, "throttle_rate": 0.05, "retry_after": 0.5},
+        "fetch": {"fetch_mode": "concurrent", "max_workers": 8, "sink": "null"}
+    },
+    "location_concurrent": {
+        "method": "location", "sessions": 2, "minutes": 10,
+        "server": {"latency_ms": 20, "jitter_ms": 20},
+        "fetch": {"fetch_mode": "concurrent", "max_workers": 8, "sink": "null"}
+    },
+    "laps_concurrent": {
+        "method": "laps", "drivers": 20, "sessions": 5,
+        "server": {"latency_ms": 50, "jitter_ms": 50},
+        "fetch": {"fetch_mode": "concurrent", "max_workers": 8, "sink": "null"}
+    },
+    "laps_coalesced": {
+        "method": "laps", "drivers": 20, "sessions": 5,
+        "server": {"latency_ms": 50, "jitter_ms": 50},
+        "fetch": {"fetch_mode": "concurrent", "max_workers": 8, "sink": "null", "coalesce_drivers": True}
+    },
+}
+
+# Bez limitu tempa - mierzymy przepustowość potoku, nie limit API
+DEFAULT_FETCH = {"requests_per_second": 1000.0, "buffer_size": 50000}
+
+
+def make_params(scenario: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One entry per session (and driver, if the scenario sets 'drivers').
+    car_data/location are not filtered by driver - one request returns all drivers.
+    """
+    start = datetime(2024, 3, 2, 15, 0)
+    window = {}
+    if "minutes" in scenario:
+        window = {"date_start": start.isoformat(), "date_end": (start + timedelta(minutes=scenario["minutes"])).isoformat()}
+    drivers = DRIVERS[:scenario["drivers"]] if "drivers" in scenario else [None]
+    params = [
+        {"meeting_key": 1229, "session_key": 9472 + s, **({"driver_number": d} if d is not None else {}), **window}
+        for s in range(scenario.get("sessions", 1)) for d in drivers
+    ]
+    return {"method": scenario["method"], "params": params}
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak RSS of the current process. On Linux VmHWM - ru_maxrss survives exec,
+    so a spawned child would report the parent's peak.
+    """
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss: KB na Linuksie, bajty na macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+
+
+def _run_scenario(api_url: str, scenario: Dict[str, Any], result_queue) -> None:
+    """
+    Scenario worker (fresh process): runs fetch_and_buffer_data and reports rows/s and peak RSS.
+    """
+    from utils.utils_fetch_and_buffer_data import fetch_and_buffer_data
+
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        param_path = os.path.join(tmp_dir, "params.json")
+        with open(param_path, "w", encoding="utf-8") as f:
+            json.dump(make_params(scenario), f)
+
+        start = time.perf_counter()
+        summary = fetch_and_buffer_data(
+            param_file_path=param_path,
+            api_url=api_url,
+            sink_path=os.path.join(tmp_dir, "output"),
+            slice_state_path=None,
+            **{**DEFAULT_FETCH, **scenario["fetch"]}
+        )
+        elapsed = time.perf_counter() - start
+
+    counters = summary["metrics"]["counters"]
+    result_queue.put({
+        "rows": summary["rows"],
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(summary["rows"] / elapsed, 1) if elapsed else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "api_calls": counters.get("api_calls", 0),
+        "retries": counters.get("retries", 0),
+        "mb_received": round(counters.get("bytes_received", 0) / (1024 * 1024), 2),
+        "stages": {stage: stats["total_s"] for stage, stats in summary["metrics"]["stages"].items()}
+    })
+
+
+def run_scenario(name: str, repeat: int) -> Dict[str, Any]:
+    scenario = SCENARIOS[name]
+    ctx = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        with StandInServer(**scenario["server"]) as server:
+            result_queue = ctx.Queue()
+            process = ctx.Process(target=_run_scenario, args=(server.url, scenario, result_queue), name=f"bench-{name}")
+            process.start()
+            result = None
+            while result is None and (process.is_alive() or not result_queue.empty()):
+                try:
+                    result = result_queue.get(timeout=1.0)
+                except queue.Empty:
+                    pass
+            process.join()
+            if result is None or process.exitcode != 0:
+                raise RuntimeError(f"Scenario {name} failed (exit code {process.exitcode})")
+            result["http_statuses"] = dict(server.requests)
+            runs.append(result)
+    # Najlepszy z powtórzeń (najmniej zakłóceń)
+    return max(runs, key=lambda r: r["rows_per_s"])
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["rows_per_s"], result["rows_per_s"]
+        if before and after < before * (1 - tolerance):
+            regressions.append(f"{name}: {before:,.0f} -> {after:,.0f} rows/s ({after / before - 1:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable). Default: all.")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", help="Write results as JSON (usable as a later --baseline).")
+    parser.add_argument("--baseline", help="Results JSON of a previous run to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed rows/s drop vs baseline. Default: 0.2.")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'scenario':<32}{'rows':>10}{'seconds':>10}{'rows/s':>12}{'peak RSS MB':>13}{'API calls':>11}{'retries':>9}  HTTP")
+    for name in args.scenario or SCENARIOS:
+        result = results[name] = run_scenario(name, args.repeat)
+        print(
+            f"{name:<32}{result['rows']:>10,}{result['seconds']:>10.2f}{result['rows_per_s']:>12,.0f}"
+            f"{result['peak_rss_mb']:>13.1f}{result['api_calls']:>11.0f}{result['retries']:>9.0f}  {result['http_statuses']}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
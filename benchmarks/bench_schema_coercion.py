@@ -0,0 +1,48 @@
+"""
+Micro-benchmark of schema coercion per endpoint: df.astype(get_schema()) (before)
+vs the precompiled SchemaConverter (after).
+
+Usage:
+    python -m benchmarks.bench_schema_coercion [--rows 20000] [--repeat 5]
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_records
+from utils.class_APIClient import APIClient
+
+
+def best_time(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    client = APIClient(api_url="http://localhost")
+    print(f"{'endpoint':<16}{'astype rows/s':>16}{'converter rows/s':>20}{'speedup':>10}")
+
+    for endpoint, builder in client.builder.items():
+        schema = builder.get_schema()
+        df = pd.DataFrame(make_records(schema, args.rows))
+        converter = builder.get_converter()
+
+        before = best_time(lambda: df.astype(builder.get_schema()), args.repeat)
+        after = best_time(lambda: converter.convert(df), args.repeat)
+        print(f"{endpoint:<16}{args.rows / before:>16,.0f}{args.rows / after:>20,.0f}{before / after:>9.1f}x")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
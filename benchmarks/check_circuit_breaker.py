@@ -0,0 +1,91 @@
+"""
+Regression check of the circuit breaker's half-open probe (no network): a stub session answers
+with scripted HTTP statuses and every scenario must finish within the timeout with the probe released.
+
+    503 -> 429 -> 200   the probe gets a 429; the same worker must probe again instead of waiting on itself
+    503 -> 404          the probe gets a client error; the other workers must not wait forever
+
+Usage:
+    python -m benchmarks.check_circuit_breaker
+"""
+import io
+import json
+import logging
+import sys
+import threading
+
+from typing import List
+
+import requests
+
+from utils.class_APIClient import APIClient
+from utils.class_RetryPolicy import RetryPolicy
+
+TIMEOUT = 10.0
+
+
+class ScriptedSession:
+    """
+    Stand-in for requests.Session: answers get() with the scripted statuses, then with 200.
+    """
+    def __init__(self, statuses: List[int]):
+        self.statuses = list(statuses)
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None, stream=False) -> requests.Response:
+        with self._lock:
+            status = self.statuses.pop(0) if self.statuses else 200
+        response = requests.Response()
+        response.status_code = status
+        response.reason = {200: "OK", 404: "Not Found", 429: "Too Many Requests", 503: "Service Unavailable"}[status]
+        response.url = url
+        response.headers["Retry-After"] = "0"
+        response._content = json.dumps([{"session_key": 1}] if status == 200 else {"detail": response.reason}).encode()
+        response.raw = io.BytesIO(response._content)
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def run_scenario(name: str, statuses: List[int], workers: int) -> bool:
+    policy = RetryPolicy(max_attempts=5, base_delay=0.05, max_delay=0.1, failure_threshold=1, cooldown=0.2)
+    client = APIClient(api_url="http://stand-in", retry_policy=policy, session=ScriptedSession(statuses))
+    outcomes = []
+
+    def call() -> None:
+        try:
+            client._mock_api_call(api_data={"session_key": 1}, api_url="http://stand-in/v1/laps")
+            outcomes.append("ok")
+        except requests.HTTPError:
+            outcomes.append("client_error")
+        except Exception as e:
+            outcomes.append(f"error: {e}")
+
+    threads = [threading.Thread(target=call, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(TIMEOUT)
+
+    blocked = sum(thread.is_alive() for thread in threads)
+    breaker = policy.breaker
+    passed = not blocked and not breaker._probe_in_flight and not any(o.startswith("error") for o in outcomes)
+    print(
+        f"{name:<16} {'PASS' if passed else 'FAIL'}  outcomes={sorted(outcomes)} blocked={blocked} "
+        f"state={breaker.state} probe_in_flight={breaker._probe_in_flight}"
+    )
+    return passed
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.WARNING)
+    results = [
+        run_scenario("probe_429", [503, 429], workers=1),
+        run_scenario("probe_404", [503, 404], workers=3)
+    ]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
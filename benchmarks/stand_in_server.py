@@ -0,0 +1,225 @@
+"""
+Local stand-in for the OpenF1 API serving synthetic payloads (JSON or CSV with csv=true).
+
+Row counts follow the request: time-windowed endpoints (date> / date<) return
+sample_rate_hz rows per second of window and driver, laps return laps_per_session rows
+per driver, other endpoints rows_per_request rows. Responses are deterministic per query.
+Latency and error injection (503 / 429 with Retry-After / empty 200) are configurable.
+
+Usage (standalone):
+    python -m benchmarks.stand_in_server --port 8765 --latency-ms 80 --error-rate 0.01
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.parse
+
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import pandas as pd
+
+from benchmarks.synthetic import make_records
+from utils.class_APIClient import APIClient
+
+DRIVERS = (1, 4, 10, 11, 14, 16, 18, 20, 22, 23, 24, 27, 31, 44, 55, 63, 77, 81, 2, 3)
+
+
+class StandInServer:
+    """
+    Threaded HTTP server on 127.0.0.1, started in a daemon thread.
+    """
+    def __init__(
+        self,
+        port: int = 0,
+        sample_rate_hz: float = 3.7,
+        laps_per_session: int = 57,
+        rows_per_request: int = 100,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        empty_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+        null_rate: float = 0.01,
+        seed: int = 0
+    ):
+        """
+        Args:
+            port (int, optional): Port to listen on, 0 = any free port. Defaults to 0.
+            sample_rate_hz (float, optional): Rows per second of window and driver (car_data ~3.7 Hz). Defaults to 3.7.
+            laps_per_session (int, optional): Rows per driver for laps. Defaults to 57.
+            rows_per_request (int, optional): Rows for other endpoints. Defaults to 100.
+            latency_ms (float, optional): Added response latency. Defaults to 0.
+            jitter_ms (float, optional): Uniform random extra latency. Defaults to 0.
+            error_rate (float, optional): Fraction of requests answered with 503. Defaults to 0.
+            empty_rate (float, optional): Fraction of requests answered with an empty 200. Defaults to 0.
+            throttle_rate (float, optional): Fraction of requests answered with 429. Defaults to 0.
+            retry_after (float, optional): Retry-After (seconds) sent with 429. Defaults to 1.
+            null_rate (float, optional): Fraction of null values in generated rows. Defaults to 0.01.
+            seed (int, optional): Seed of the payload generator and error injection. Defaults to 0.
+        """
+        self.sample_rate_hz = sample_rate_hz
+        self.laps_per_session = laps_per_session
+        self.rows_per_request = rows_per_request
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.empty_rate = empty_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.null_rate = null_rate
+        self.seed = seed
+        self.requests = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        with APIClient(api_url="") as client:
+            self._schemas = {endpoint: builder.get_schema() for endpoint, builder in client.builder.items()}
+        self._body = lru_cache(maxsize=4096)(self._make_body)
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stand-in-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    # --- Generowanie danych ---
+
+    def _n_rows(self, endpoint: str, query: dict) -> int:
+        drivers = 1 if "driver_number" in query else len(DRIVERS)
+        if "date>" in query and "date<" in query:
+            window = datetime.fromisoformat(query["date<"]) - datetime.fromisoformat(query["date>"])
+            return max(0, int(window.total_seconds() * self.sample_rate_hz)) * drivers
+        if endpoint == "laps":
+            return self.laps_per_session * drivers
+        return self.rows_per_request
+
+    def _make_body(self, endpoint: str, query_items: tuple) -> bytes:
+        query = dict(query_items)
+        schema = self._schemas[endpoint]
+        n_rows = self._n_rows(endpoint, query)
+        seed = int(hashlib.sha1(f"{self.seed}|{endpoint}|{query_items}".encode("utf-8")).hexdigest()[:8], 16)
+        records = make_records(schema, n_rows, null_rate=self.null_rate, seed=seed)
+
+        start = datetime.fromisoformat(query["date>"]) if "date>" in query else datetime(2024, 3, 2, 15, 0)
+        step = timedelta(seconds=1 / self.sample_rate_hz)
+        for i, record in enumerate(records):
+            for key in ("meeting_key", "session_key", "driver_number"):
+                if key in query and key in record:
+                    record[key] = int(query[key])
+            if "driver_number" in record and "driver_number" not in query:
+                record["driver_number"] = DRIVERS[i % len(DRIVERS)]
+            if "date" in record:
+                record["date"] = (start + step * (i // (1 if "driver_number" in query else len(DRIVERS)))).isoformat() + "+00:00"
+            if endpoint == "laps":
+                record["lap_number"] = i % self.laps_per_session + 1
+
+        if query.get("csv") == "true":
+            if not records:
+                return b""
+            # Int64 z brakami nie może trafić do CSV jako float ("13.0")
+            df = pd.DataFrame(records, columns=list(schema)).astype({c: "Int64" for c, t in schema.items() if t == "Int64"})
+            return df.to_csv(index=False).encode("utf-8")
+        return json.dumps(records).encode("utf-8")
+
+    # --- HTTP ---
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parsed = urllib.parse.urlparse(self.path)
+                endpoint = parsed.path.rstrip("/").rsplit("/", 1)[-1]
+                query = tuple(sorted(urllib.parse.parse_qsl(parsed.query)))
+
+                with server._lock:
+                    roll = server._rng.random()
+                    delay = (server.latency_ms + server._rng.uniform(0, server.jitter_ms)) / 1000
+                if delay:
+                    time.sleep(delay)
+
+                headers = {}
+                if endpoint not in server._schemas:
+                    status, body = 404, b'{"detail": "Not Found"}'
+                elif roll < server.throttle_rate:
+                    status, body = 429, b'{"detail": "Too Many Requests"}'
+                    headers["Retry-After"] = f"{server.retry_after:g}"
+                elif roll < server.throttle_rate + server.error_rate:
+                    status, body = 503, b'{"detail": "Service Unavailable"}'
+                elif roll < server.throttle_rate + server.error_rate + server.empty_rate:
+                    status, body = 200, b"" if ("csv", "true") in query else b"[]"
+                else:
+                    status, body = 200, server._body(endpoint, query)
+
+                with server._lock:
+                    server.requests[status] += 1
+                self.send_response(status)
+                self.send_header("Content-Type", "text/csv" if ("csv", "true") in query else "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--empty-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args()
+
+    server = StandInServer(
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        empty_rate=args.empty_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after
+    )
+    server.start()
+    print(f"Serving synthetic OpenF1 API at {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
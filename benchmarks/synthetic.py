@@ -0,0 +1,49 @@
+# Syntetyczne dane OpenF1 na potrzeby benchmarków
+import random
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+# Realistyczne zakresy wartości (m.in. żeby wąskie typy COMPACT_SCHEMA miały zastosowanie)
+VALUE_RANGES = {
+    "driver_number": (1, 99),
+    "brake": (0, 100),
+    "drs": (0, 14),
+    "n_gear": (0, 8),
+    "throttle": (0, 104),
+    "speed": (0, 360),
+    "rpm": (0, 13000),
+    "x": (-9000, 9000),
+    "y": (-9000, 9000),
+    "z": (-500, 500),
+    "interval": (0, 120),
+}
+
+
+def make_records(schema: Dict[str, str], n_rows: int, null_rate: float = 0.01, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Generates n_rows JSON-like records matching a builder schema (as returned by the OpenF1 API).
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 3, 2, 15, 0, tzinfo=timezone.utc)
+
+    def value(name: str, dtype: str, i: int):
+        if dtype != "boolean" and rng.random() < null_rate and name not in {"meeting_key", "session_key", "date"}:
+            return None
+        if name == "meeting_key":
+            return 1229
+        if name == "session_key":
+            return 9472
+        if dtype == "Int64":
+            return rng.randint(*VALUE_RANGES.get(name, (0, 15000)))
+        if dtype == "float64":
+            return round(rng.uniform(*VALUE_RANGES.get(name, (-5000, 5000))), 3)
+        if dtype == "boolean":
+            return rng.random() < 0.5
+        if dtype.startswith("datetime64"):
+            return (start + timedelta(milliseconds=270 * i)).isoformat()
+        if dtype == "object":
+            return [rng.choice([2048, 2049, 2051, 2064]) for _ in range(8)]
+        return f"{name}_{rng.randint(0, 20)}"
+
+    return [{name: value(name, dtype, i) for name, dtype in schema.items()} for i in range(n_rows)]
@@ -1,32 +1,167 @@
 #from utils_fetch_and_buffer_data import fetch_and_buffer_data
-from utils.utils_fetch_and_buffer_data import fetch_and_buffer_data
+from utils.utils_sharding import run_sharded, shard_rate
+from utils.utils_load_parameters import get_parameters, is_multi_endpoint
 from utils.utils_loging_setup import setup_logging
+from utils.class_ResponseCache import ResponseCache
+from utils.class_RetryPolicy import RetryPolicy
 import logging
 import os
 
 # Pobierz tryb logowania z zmiennej środowiskowej, domyślnie "console"
 log_mode = os.getenv("LOG_MODE", "console")
+# Logowanie przez kolejkę i wątek w tle - pętla pobierania nie czeka na zapis stdout / app.log
+async_logging = os.getenv("LOG_ASYNC", "false").lower() == "true"
+# Format linii logu: 'text' (domyślnie) lub 'json' (jeden obiekt JSON na linię)
+log_format = os.getenv("LOG_FORMAT", "text")
 
 # Konfiguracja logowania
-setup_logging(log_mode=log_mode)
+setup_logging(log_mode=log_mode, async_logging=async_logging, log_format=log_format)
 
 # Inicjalizacja loggera
 logger = logging.getLogger(__name__)
 
 def main():
-    # Ścieżka do pliku params.json w kontenerze
-    param_file_path = "./input/params.json"
+    # Ścieżka do pliku z parametrami w kontenerze: params.json lub plan JSON Lines (.jsonl, czytany strumieniowo)
+    param_file_path = os.getenv("PARAMS_PATH", "./input/params.json")
 
-    BASE_URL = "https://api.openf1.org/v1"
-    # Rozmiar bufora (domyślnie 1000, można dostosować)
-    buffer_size = 5000
+    # Adres API (np. lokalny serwer zastępczy z benchmarks/stand_in_server.py)
+    BASE_URL = os.getenv("API_URL", "https://api.openf1.org/v1")
+    # Rozmiar bufora (domyślnie 5000 wierszy) = liczba wierszy na jeden zapis do sinka
+    buffer_size = int(os.getenv("BUFFER_SIZE", "5000"))
+    # Limit pamięci bufora w MB (opcjonalny, obok limitu wierszy)
+    buffer_max_mb = float(os.getenv("BUFFER_MAX_MB", "0")) or None
+    # Twardy limit pamięci bufora w MB - nadmiar zrzucany na dysk (segmenty Arrow IPC), duże BUFFER_SIZE bez OOM
+    buffer_spill_mb = float(os.getenv("BUFFER_SPILL_MB", "0")) or None
+    spill_dir = os.getenv("SPILL_DIR", "") or None
+    # Cel zapisu: 'snowflake' (domyślnie), 'parquet' (lokalny zbiór Parquet w SINK_PATH) lub 'null' (benchmarki)
+    sink = os.getenv("SINK", "snowflake")
+    sink_path = os.getenv("SINK_PATH", "./output")
+    # Tryb ładowania do Snowflake: 'write_pandas' (domyślnie) lub 'stage' (PUT + jeden COPY INTO)
+    load_mode = os.getenv("SNOWFLAKE_LOAD_MODE", "write_pandas")
+    # Liczba wątków zapisujących w tle (0 = zapis synchroniczny)
+    writer_threads = int(os.getenv("WRITER_THREADS", "0"))
+    # Tryb pobierania: 'sequential' (domyślnie) lub 'concurrent'
+    fetch_mode = os.getenv("FETCH_MODE", "sequential")
+    max_workers = int(os.getenv("FETCH_MAX_WORKERS", "4"))
+    requests_per_second = float(os.getenv("FETCH_REQUESTS_PER_SECOND", "3"))
     
-    # Wywołanie funkcji
-    fetch_and_buffer_data(
+    # Lokalny cache odpowiedzi API (pusty CACHE_DIR = wyłączony)
+    cache_dir = os.getenv("CACHE_DIR", "")
+    response_cache = ResponseCache(
+        cache_dir=cache_dir,
+        ttl_seconds=int(float(os.getenv("CACHE_TTL_HOURS", "24")) * 3600),
+        max_bytes=int(float(os.getenv("CACHE_MAX_MB", "1024")) * 1024 * 1024),
+        never_expire_historical=os.getenv("CACHE_NEVER_EXPIRE_HISTORICAL", "true").lower() == "true"
+    ) if cache_dir else None
+    
+    # Ponowienia: backoff z jitterem, Retry-After, wspólna pauza po 429, circuit breaker dla serii błędów 5xx
+    retry_policy = RetryPolicy(
+        max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "5")),
+        base_delay=float(os.getenv("RETRY_BASE_DELAY", "2")),
+        max_delay=float(os.getenv("RETRY_MAX_DELAY", "60")),
+        empty_retries=int(os.getenv("RETRY_EMPTY_RESPONSES", "1")),
+        failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+        cooldown=float(os.getenv("CIRCUIT_COOLDOWN", "30"))
+    )
+    
+    # Szybkie dekodowanie CSV -> kolumny Arrow (endpointy o płaskim schemacie)
+    columnar_decode = os.getenv("COLUMNAR_DECODE", "false").lower() == "true"
+    # Wąskie typy (UInt8/UInt16, float32, category) dla car_data, location i intervals
+    compact_schema = os.getenv("COMPACT_SCHEMA", "false").lower() == "true"
+    # Plik checkpointu - restart kontynuuje od ostatniego zapisanego fragmentu (pusty = wyłączony)
+    checkpoint_path = os.getenv("CHECKPOINT_PATH", "") or None
+    # Ładowanie przyrostowe - tylko dane nowsze niż znaczniki (watermarki) z poprzednich przebiegów
+    incremental = os.getenv("INCREMENTAL", "false").lower() == "true"
+    watermark_path = os.getenv("WATERMARK_PATH", "./input/watermarks.json")
+    # Scalanie zapytań wielu kierowców w jedno zapytanie na sesję / okno czasowe
+    coalesce_drivers = os.getenv("COALESCE_DRIVERS", "false").lower() == "true"
+    coalesce_min_drivers = int(os.getenv("COALESCE_MIN_DRIVERS", "2"))
+    # Usuwanie duplikatów (klucz naturalny endpointu) przed zapisem
+    dedup = os.getenv("DEDUP", "false").lower() == "true"
+    dedup_max_keys = int(os.getenv("DEDUP_MAX_KEYS", "2000000"))
+    # Podsumowanie przebiegu (czasy etapów, wiersze/s, bajty, ponowienia) - JSON i plik tekstowy Prometheusa
+    metrics_path = os.getenv("METRICS_PATH", "") or None
+    metrics_prom_path = os.getenv("METRICS_PROM_PATH", "") or None
+    
+    # Adaptacyjna szerokość okien czasowych (car_data, location, intervals, ...)
+    adaptive_slicing = os.getenv("ADAPTIVE_SLICING", "false").lower() == "true"
+    slice_target_rows = int(os.getenv("SLICE_TARGET_ROWS", "2000"))
+    slice_state_path = os.getenv("SLICE_STATE_PATH", "") or None
+    # Linie logu per pod-zapytanie: 1 = każda na INFO, N > 1 = podsumowanie co N pod-zapytań (szczegóły na DEBUG)
+    log_every = int(os.getenv("LOG_EVERY", "1"))
+    
+    # Sharding: SHARD_PROCESSES > 1 - lokalne procesy; SHARD_COUNT/SHARD_INDEX - jeden shard na instancję zadania Airflow
+    shard_processes = int(os.getenv("SHARD_PROCESSES", "1"))
+    shard_count = int(os.getenv("SHARD_COUNT", "1"))
+    shard_index = int(os.getenv("SHARD_INDEX", "0"))
+    # Wiele endpointów w jednym przebiegu ('runs' / 'methods' w params.json) - liczba endpointów warstwy pobieranych równolegle
+    max_parallel_endpoints = int(os.getenv("MAX_PARALLEL_ENDPOINTS", "4"))
+
+    fetch_kwargs = dict(
         param_file_path=param_file_path,
         api_url=BASE_URL,
-        buffer_size=buffer_size
+        buffer_size=buffer_size,
+        buffer_max_mb=buffer_max_mb,
+        buffer_spill_mb=buffer_spill_mb,
+        spill_dir=spill_dir,
+        sink=sink,
+        sink_path=sink_path,
+        load_mode=load_mode,
+        writer_threads=writer_threads,
+        fetch_mode=fetch_mode,
+        max_workers=max_workers,
+        requests_per_second=requests_per_second,
+        response_cache=response_cache,
+        retry_policy=retry_policy,
+        columnar_decode=columnar_decode,
+        compact_schema=compact_schema,
+        checkpoint_path=checkpoint_path,
+        incremental=incremental,
+        watermark_path=watermark_path,
+        coalesce_drivers=coalesce_drivers,
+        coalesce_min_drivers=coalesce_min_drivers,
+        dedup=dedup,
+        dedup_max_keys=dedup_max_keys,
+        metrics_path=metrics_path,
+        metrics_prom_path=metrics_prom_path,
+        adaptive_slicing=adaptive_slicing,
+        slice_target_rows=slice_target_rows,
+        slice_state_path=slice_state_path,
+        log_every=log_every
     )
 
+    multi_endpoint = is_multi_endpoint(get_parameters(input_path=param_file_path))
+    if shard_count > 1 and (multi_endpoint or shard_processes <= 1):
+        # SHARD_COUNT instancji odpytuje to samo API - FETCH_REQUESTS_PER_SECOND to limit łączny, dzielony na shardy
+        # (przy SHARD_PROCESSES > 1 dzieli go run_sharded, przez SHARD_COUNT * SHARD_PROCESSES)
+        fetch_kwargs["requests_per_second"] = shard_rate(requests_per_second, shard_count)
+
+    # Wywołanie funkcji
+    if multi_endpoint:
+        if shard_processes > 1:
+            logger.warning("SHARD_PROCESSES is not supported for multi-endpoint runs, running in one process.")
+        from utils.utils_multi_endpoint import fetch_endpoints
+        fetch_endpoints(
+            max_parallel_endpoints=max_parallel_endpoints,
+            shard_index=shard_index,
+            shard_count=shard_count,
+            **fetch_kwargs
+        )
+    elif shard_processes > 1:
+        # Procesy tej instancji dostają kolejne shardy globalne: shard_index * SHARD_PROCESSES + i z SHARD_COUNT * SHARD_PROCESSES
+        run_sharded(
+            shard_count=shard_processes,
+            instance_index=shard_index,
+            instance_count=shard_count,
+            log_mode=log_mode,
+            async_logging=async_logging,
+            log_format=log_format,
+            **fetch_kwargs
+        )
+    else:
+        # Import odroczony - proces nadrzędny shardów nie potrzebuje pandas / pyarrow / snowflake
+        from utils.utils_fetch_and_buffer_data import fetch_and_buffer_data
+        fetch_and_buffer_data(shard_index=shard_index, shard_count=shard_count, **fetch_kwargs)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
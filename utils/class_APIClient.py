@@ -1,43 +1,113 @@
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional
 from datetime import datetime
 
+import io
 import requests
 import pandas as pd
+import pyarrow as pa
 import time
 import logging
 
-from .class_APIRequestBuilder import *
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from urllib3.util.retry import Retry
+
+from .class_APIRequestBuilder import BuilderRegistry, SchemaConverter
+from .class_ResponseCache import ResponseCache
+from .class_RetryPolicy import RetryPolicy, ThrottledError
+from .class_RunMetrics import RunMetrics
+from .class_TokenBucket import TokenBucket
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
 class APIClient:
-    def __init__(self, api_url):
+    def __init__(
+        self,
+        api_url,
+        pool_size: int = 10,
+        http_retries: int = 2,
+        cache: Optional[ResponseCache] = None,
+        columnar_decode: bool = False,
+        compact_schema: bool = False,
+        metrics: Optional[RunMetrics] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        session: Optional[requests.Session] = None,
+        rate_limiter: Optional[TokenBucket] = None
+    ):
+        """
+        Args:
+            api_url (str): Base API URL.
+            pool_size (int, optional): Max number of kept-alive connections per host.
+                Should be >= number of fetch workers. Defaults to 10.
+            http_retries (int, optional): urllib3-level retries for connection/read errors
+                (before the application-level retry in _mock_api_call). Defaults to 2.
+            cache (ResponseCache, optional): On-disk response cache checked before calling the API. Defaults to None.
+            columnar_decode (bool, optional): For endpoints with a flat schema, request CSV and decode the streamed body
+                straight into typed Arrow columns instead of JSON -> list of dicts -> DataFrame -> astype. Defaults to False.
+            compact_schema (bool, optional): For high-volume endpoints (car_data, location, intervals) narrow the columns
+                to the builder's compact dtypes (UInt8/UInt16, float32, category) when lossless. Defaults to False.
+            metrics (RunMetrics, optional): Collects http/decode/convert timings, bytes received and retries.
+                Defaults to None (a private RunMetrics instance).
+            retry_policy (RetryPolicy, optional): Backoff, 429 throttling and circuit breaker rules shared by all
+                workers using this client. Defaults to None (RetryPolicy()).
+            session (requests.Session, optional): Connection pool shared with other clients (see create_session);
+                not closed by close(). Defaults to None (own session with pool_size connections).
+            rate_limiter (TokenBucket, optional): One token is taken per API call; responses served from the cache
+                skip it. Defaults to None (no rate limit).
+        """
         self.api_url = api_url
-        self.builder = {
-            # Tier 1
-            "meetings": MeetingsRequestBuilder(),
-            # Tier 2
-            "sessions": SessionsRequestBuilder(),
-            # Tier 3
-            "drivers": DriversRequestBuilder(),
-            "race_control": RaceControlRequestBuilder(),
-            "session_result": SessionResultRequestBuilder(),
-            "starting_grid": StartingGridRequestBuilder(),
-            "stints": StintsRequestBuilder(),
-            "team_radio": TeamRadioRequestBuilder(),
-            "weather": WeatherRequestBuilder(),
-            # Tier 4
-            "laps": LapsRequestBuilder(),
-            "overtakes": OvertakesRequestBuilder(),
-            "pit": PitRequestBuilder(),
-            "position": PositionRequestBuilder(),
-            # Tier 5.1
-            "intervals": IntervalsRequestBuilder(),
-            # Tier 5.2
-            "car_data": CarDataRequestBuilder(),
-            "location": LocationRequestBuilder()
-        }
+        self.cache = cache
+        self.columnar_decode = columnar_decode
+        self.compact_schema = compact_schema
+        self.metrics = metrics if metrics is not None else RunMetrics()
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self._owns_session = session is None
+        self.session = session if session is not None else self.create_session(pool_size=pool_size, http_retries=http_retries)
+        # Buildery tworzone leniwie przy pierwszym zapytaniu do endpointu
+        self.builder = BuilderRegistry()
+
+    @staticmethod
+    def create_session(pool_size: int, http_retries: int = 2) -> requests.Session:
+        """
+        Creates a connection-pooled, keep-alive session shared by all fetch workers.
+        """
+        retry = Retry(
+            total=http_retries,
+            connect=http_retries,
+            read=http_retries,
+            status=0,  # statusy HTTP obsługuje _mock_api_call
+            backoff_factor=0.5,
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive"
+        })
+        return session
+
+    def close(self) -> None:
+        """
+        Closes the HTTP session and releases pooled connections (a shared session is left to its owner).
+        """
+        if not self._owns_session:
+            return
+        self.session.close()
+        logger.debug("HTTP session closed.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def fetch_data(self, endpoint: str, params: Dict[str, Any]) -> pd.DataFrame:
         """
@@ -51,42 +121,154 @@ class APIClient:
 
         url = f"{self.api_url}/{endpoint}"
 
-        response_json = self._mock_api_call(api_data=payload, api_url=url)
+        converter = builder.get_converter(compact=self.compact_schema)
 
-        schema = builder.get_schema()
+        if self.columnar_decode and converter.arrow_schema is not None:
+            return self._fetch_columnar(endpoint, payload, url, converter)
 
-        logger.debug(f"API response from {endpoint}: {response_json}")
+        response_json = self.cache.get(endpoint, payload) if self.cache is not None else None
+        if response_json is None:
+            response_json = self._mock_api_call(api_data=payload, api_url=url)
+            # Puste odpowiedzi nie są cache'owane (mogą być chwilowym błędem API)
+            if self.cache is not None and response_json:
+                self.cache.set(endpoint, payload, response_json)
+
+        logger.debug("API response from %s: %s", endpoint, response_json)
 
         if not response_json:
             logger.warning(f"Empty API response from {endpoint}, returning empty DataFrame with schema.")
-            df = pd.DataFrame(columns=schema.keys()).astype(schema)
+            df = converter.empty_frame()
         else:
-            df = pd.DataFrame(response_json)
-            logger.debug(f"DataFrame columns: {df.columns.tolist()}")
-            df = df.astype(schema)
+            with self.metrics.timer("convert"):
+                df = pd.DataFrame(response_json)
+                logger.debug("DataFrame columns: %s", df.columns)
+                df = converter.convert(df)
 
         return df
+
+    def _fetch_columnar(
+        self,
+        endpoint: str,
+        payload: Dict[str, Any],
+        url: str,
+        converter: SchemaConverter
+    ) -> pd.DataFrame:
+        """
+        Fetches the endpoint as CSV and parses it with the Arrow CSV reader using column types from the schema.
+        Without a cache the body is parsed while it streams from the socket.
+        """
+        csv_payload = {**payload, "csv": "true"}
+        arrow_schema = converter.arrow_schema
+
+        cached = self.cache.get(endpoint, csv_payload) if self.cache is not None else None
+        if cached is not None:
+            table = self._read_csv(io.BytesIO(cached.encode("utf-8")), arrow_schema)
+
+        elif self.cache is not None:
+            def decode(response: requests.Response) -> Optional[pa.Table]:
+                body = response.content
+                table = self._read_csv(io.BytesIO(body), arrow_schema)
+                if table is not None and table.num_rows:
+                    self.cache.set(endpoint, csv_payload, body.decode("utf-8"))
+                return table
+
+            table = self._mock_api_call(api_data=csv_payload, api_url=url, decode=decode)
+
+        else:
+            def decode(response: requests.Response) -> Optional[pa.Table]:
+                response.raw.decode_content = True
+                return self._read_csv(response.raw, arrow_schema)
+
+            table = self._mock_api_call(api_data=csv_payload, api_url=url, decode=decode, stream=True)
+
+        if table is None or table.num_rows == 0:
+            logger.warning(f"Empty API response from {endpoint}, returning empty DataFrame with schema.")
+            return converter.empty_frame()
+
+        schema = converter.schema
+        with self.metrics.timer("convert"):
+            df = table.to_pandas(types_mapper={
+                pa.int64(): pd.Int64Dtype(),
+                pa.string(): pd.StringDtype(),
+                pa.bool_(): pd.BooleanDtype()
+            }.get)
+            # Kolejność kolumn jak w schemacie, dodatkowe kolumny z API na końcu
+            ordered = [c for c in schema if c in df.columns] + [c for c in df.columns if c not in schema]
+            return converter.compact(df[ordered])
+
+    @staticmethod
+    def _read_csv(source, arrow_schema: pa.Schema) -> Optional[pa.Table]:
+        # Import odroczony - czytnik CSV potrzebny tylko w trybie columnar_decode
+        import pyarrow.csv as pa_csv
+        try:
+            return pa_csv.read_csv(
+                source,
+                convert_options=pa_csv.ConvertOptions(column_types=arrow_schema, strings_can_be_null=True)
+            )
+        except pa.ArrowInvalid as exc:
+            if "Empty CSV" in str(exc):
+                return None
+            raise
+
+    @staticmethod
+    def _received_bytes(response: requests.Response) -> int:
+        # Bajty odczytane z gniazda (przed dekompresją gzip)
+        try:
+            return int(response.raw.tell())
+        except (AttributeError, TypeError, ValueError):
+            return 0
     
     def _mock_api_call(
         self,
         api_data: Dict[str, Any],
         api_url: str,
-        max_attempts: int = 5,
-        backoff: int = 5,
-        timeout: tuple = (5, 15)
+        timeout: tuple = (5, 15),
+        decode: Optional[Callable[[requests.Response], Any]] = None,
+        stream: bool = False
     ) -> Optional[Dict[str, Any]]:
-        
-        for attempt in range(1, max_attempts + 1):
-            logger.info(f"Attempt {attempt} with parameters: {api_data}")
+        """
+        Calls the API following self.retry_policy:
+        - 5xx, network and invalid body errors: jittered exponential backoff (Retry-After honored), up to max_attempts;
+        - 429: all workers pause on the shared throttle gate (Retry-After or backoff), not counted as an attempt;
+        - empty 200: retried empty_retries times, then accepted as an empty result;
+        - sustained failures open the circuit breaker, which pauses all calls.
+        The body is decoded with response.json() unless a decode callable is given.
+        """
+        policy = self.retry_policy
+        attempt = 0
+        throttled = 0
+        empty = 0
+
+        # Limit dotyczy tylko zapytań do API - odpowiedzi z cache nie czekają na token
+        if self.rate_limiter is not None:
+            self.metrics.observe("rate_limit_wait", self.rate_limiter.acquire())
+
+        while True:
+            throttle_wait = policy.throttle.wait()
+            if throttle_wait:
+                self.metrics.observe("throttle_wait", throttle_wait)
+            circuit_wait = policy.breaker.before_call()
+            if circuit_wait:
+                self.metrics.observe("circuit_wait", circuit_wait)
+
+            attempt += 1
+            retry_after = None
+            # Pierwsza próba tylko na DEBUG - ponowienia widoczne na INFO
+            logger.log(logging.INFO if attempt > 1 else logging.DEBUG, "Attempt %d with parameters: %s", attempt, api_data)
             
             try:
-                response = requests.get(
-                    url=api_url,
-                    params=api_data,
-                    timeout=timeout
-                )
+                self.metrics.count("api_calls")
+                with self.metrics.timer("http"):
+                    response = self.session.get(
+                        url=api_url,
+                        params=api_data,
+                        timeout=timeout,
+                        stream=stream
+                    )
         
             except requests.exceptions.RequestException as exc:
+                self.metrics.count("network_errors")
+                policy.breaker.record_failure()
                 logger.warning(f"Network error on attempt {attempt}: {exc}")
                 # Continue to retry
             
@@ -95,32 +277,72 @@ class APIClient:
                 reason = response.reason
                 
                 if status == 200:
+                    policy.breaker.record_success()
                     try:
-                        response_json = response.json()
+                        with self.metrics.timer("decode"):
+                            response_json = decode(response) if decode is not None else response.json()
                     except ValueError as exc:
-                        logger.error(f"Invalid JSON on attempt {attempt}: {exc}")
+                        logger.error(f"Invalid response body on attempt {attempt}: {exc}")
+                        # Continue to retry
+                    except (requests.exceptions.RequestException, Urllib3HTTPError) as exc:
+                        # Błąd sieci podczas odczytu strumieniowanego body
+                        self.metrics.count("network_errors")
+                        logger.warning(f"Network error while reading body on attempt {attempt}: {exc}")
                         # Continue to retry
                     else:
-                        if not response_json:
-                            logger.warning(f"Empty response on attempt {attempt}, parameters={api_data}. Retrying.")
-                        else:
-                            logger.info(f"Successful response on attempt {attempt}.")
-                        return response_json
+                        self.metrics.count("bytes_received", self._received_bytes(response))
+                        if response_json:
+                            if attempt > 1:
+                                logger.info("Successful response on attempt %d.", attempt)
+                            return response_json
+                        self.metrics.count("empty_responses")
+                        if empty >= policy.empty_retries or attempt >= policy.max_attempts:
+                            logger.warning(f"Empty response on attempt {attempt}, parameters={api_data}. Accepting empty result.")
+                            return response_json
+                        empty += 1
+                        logger.warning(f"Empty response on attempt {attempt}, parameters={api_data}. Retrying.")
+
+                elif status == 429:
+                    # Limit API - wspólna pauza wszystkich workerów, próba nie jest liczona
+                    retry_after = policy.parse_retry_after(response.headers.get("Retry-After"))
+                    response.close()
+                    # Zapytanie próbne (half-open) bez rozstrzygnięcia - kolejne wywołanie spróbuje ponownie
+                    policy.breaker.release_probe()
+                    throttled += 1
+                    attempt -= 1
+                    self.metrics.count("throttled")
+                    if throttled > policy.max_throttled:
+                        raise ThrottledError(f"Throttled (429) {throttled} times for parameters={api_data}")
+                    pause = policy.delay(throttled, retry_after)
+                    logger.warning(f"Throttled (429 {reason}), all workers pausing {pause:.1f} seconds.")
+                    policy.throttle.pause(pause)
+                    continue
                 
                 elif 500 <= status < 600:
+                    self.metrics.count("server_errors")
+                    policy.breaker.record_failure()
+                    retry_after = policy.parse_retry_after(response.headers.get("Retry-After"))
                     logger.error(f"Server error {status} {reason}")
+                    response.close()
                     # Continue to retry
                 
                 else:
+                    # 4xx = API odpowiada (błąd po stronie zapytania) - zamyka też obwód half-open
+                    policy.breaker.record_success()
                     try:
                         response.raise_for_status()
                     except requests.HTTPError as exc:
                         logger.error(f"Client error {status}: {exc}")
                         raise  # Raise exception, no retry for client errors
+
+            if attempt >= policy.max_attempts:
+                break
             
-            # Retry with backoff
-            sleeptime = backoff * (2 ** (attempt - 1))
+            # Retry with jittered backoff (or Retry-After)
+            sleeptime = policy.delay(attempt, retry_after)
             logger.info(f"Sleeping {sleeptime:.1f} seconds before next attempt.")
+            self.metrics.count("retries")
+            self.metrics.count("sleep_seconds", sleeptime)
             time.sleep(sleeptime)
 
-        raise RuntimeError(f"Exceeded max attempts ({max_attempts}) for parameters={api_data}")
\ No newline at end of file
+        raise RuntimeError(f"Exceeded max attempts ({policy.max_attempts}) for parameters={api_data}")
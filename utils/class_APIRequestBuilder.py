@@ -1,5 +1,125 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from collections.abc import Mapping
+from typing import Callable, Dict, Any, Iterator, Optional, Tuple, Type
+
+import logging
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Mapowanie typów pandas (get_schema) na typy Arrow
+ARROW_TYPES = {
+    "Int64": pa.int64(),
+    "float64": pa.float64(),
+    "string": pa.string(),
+    "boolean": pa.bool_(),
+    "datetime64[ns, UTC]": pa.timestamp("ns", tz="UTC"),
+    # Wąskie typy trybu kompaktowego
+    "UInt8": pa.uint8(),
+    "UInt16": pa.uint16(),
+    "UInt32": pa.uint32(),
+    "float32": pa.float32(),
+}
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+class SchemaConverter:
+    """
+    Schema compiled once per builder into per-column converters.
+    Converts only the columns present in the response (other columns are left as they are):
+    - datetime columns: vectorized ISO 8601 parsing,
+    - Int64 columns: IntegerArray built from the numpy values and a null mask,
+    - other columns: astype.
+    With a compact_schema, columns are then narrowed (e.g. UInt8, float32, category) only if
+    the narrowed column converts back to exactly the same values (exact round trip, floats included);
+    otherwise the wide dtype is kept.
+    """
+    def __init__(self, schema: Dict[str, str], compact_schema: Optional[Dict[str, str]] = None):
+        self.schema = dict(schema)
+        self.compact_schema = {k: v for k, v in (compact_schema or {}).items() if k in self.schema}
+        self.output_schema = {**self.schema, **self.compact_schema}
+        self.arrow_schema = self._build_arrow_schema(self.schema)
+        self._converters: Dict[str, Callable[[pd.Series], Any]] = {
+            name: self._compile(dtype) for name, dtype in self.schema.items()
+        }
+
+    @staticmethod
+    def _build_arrow_schema(schema: Dict[str, str]) -> Optional[pa.Schema]:
+        fields = []
+        for name, dtype in schema.items():
+            if dtype not in ARROW_TYPES:
+                return None
+            fields.append(pa.field(name, ARROW_TYPES[dtype]))
+        return pa.schema(fields)
+
+    @staticmethod
+    def _compile(dtype: str) -> Callable[[pd.Series], Any]:
+        if dtype == "Int64":
+            return SchemaConverter._to_int64
+        if dtype.startswith("datetime64"):
+            target = pd.api.types.pandas_dtype(dtype)
+
+            def to_datetime(series: pd.Series):
+                if series.dtype == target:
+                    return series
+                result = pd.to_datetime(series, format="ISO8601", utc=True)
+                return result if result.dtype == target else result.astype(target)
+            return to_datetime
+        return lambda series: series.astype(dtype)
+
+    @staticmethod
+    def _to_int64(series: pd.Series):
+        values = series.to_numpy()
+        if values.dtype.kind in "iu":
+            return pd.arrays.IntegerArray(values.astype(np.int64, copy=False), np.zeros(len(values), dtype=bool))
+        if values.dtype.kind == "f":
+            mask = np.isnan(values)
+            with np.errstate(invalid="ignore"):
+                data = values.astype(np.int64)
+            if (data != values)[~mask].any():
+                raise TypeError(f"Cannot safely cast non-integer values of column '{series.name}' to Int64")
+            data[mask] = 0
+            return pd.arrays.IntegerArray(data, mask)
+        return series.astype("Int64")
+
+    @staticmethod
+    def _narrow(series: pd.Series, dtype: str) -> pd.Series:
+        try:
+            with np.errstate(over="ignore", invalid="ignore"):
+                narrowed = series.astype(dtype)
+        except (TypeError, ValueError, OverflowError):
+            return series
+        # Gwarancja bezstratności: dokładny powrót do typu wejściowego (pandas potrafi po cichu "zawinąć"
+        # wartości spoza zakresu, float32 zaokrągla np. 1.234 -> 1.2339999675750732)
+        lossless = narrowed.astype(series.dtype).equals(series)
+        if not lossless:
+            logger.debug(f"Column '{series.name}' does not fit {dtype} losslessly, keeping {series.dtype}.")
+            return series
+        return narrowed
+
+    def compact(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Narrows the columns listed in compact_schema (lossless only).
+        """
+        if not self.compact_schema:
+            return df
+        return pd.DataFrame(
+            {name: self._narrow(col, self.compact_schema[name]) if name in self.compact_schema else col for name, col in df.items()},
+            index=df.index
+        )
+
+    def convert(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = pd.DataFrame(
+            {name: self._converters[name](col) if name in self._converters else col for name, col in df.items()},
+            index=df.index
+        )
+        return self.compact(df)
+
+    def empty_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(columns=self.schema.keys()).astype(self.output_schema)
+
 
 class APIRequestBuilder(ABC):
     @abstractmethod
@@ -10,10 +130,97 @@ class APIRequestBuilder(ABC):
     def get_schema(self):
         pass
 
+    def get_compact_schema(self) -> Dict[str, str]:
+        """
+        Narrow dtypes used in compact schema mode (empty = no compact representation).
+        """
+        return {}
+
+    def get_natural_key(self) -> Tuple[str, ...]:
+        """
+        Columns identifying a row of the endpoint (used for deduplication; empty = no natural key).
+        """
+        return ()
+
+    def get_converter(self, compact: bool = False) -> SchemaConverter:
+        """
+        SchemaConverter compiled from get_schema() (and get_compact_schema() if compact)
+        on first use and cached on the builder.
+        """
+        converters = self.__dict__.setdefault("_converters", {})
+        if compact not in converters:
+            converters[compact] = SchemaConverter(
+                self.get_schema(),
+                compact_schema=self.get_compact_schema() if compact else None
+            )
+        return converters[compact]
+
+    def get_arrow_schema(self) -> Optional[pa.Schema]:
+        """
+        Arrow schema derived from get_schema(), or None if a column has no flat Arrow type ('object').
+        """
+        return self.get_converter().arrow_schema
+
+# Rejestr endpointów: nazwa -> klasa buildera (instancje tworzone dopiero przy pierwszym użyciu)
+ENDPOINT_REGISTRY: Dict[str, Type[APIRequestBuilder]] = {}
+
+
+def register_builder(endpoint: str, tier: float):
+    """
+    Class decorator registering a request builder under its endpoint name.
+
+    Args:
+        endpoint (str): OpenF1 endpoint name (URL path segment).
+        tier (float): Metadata tier of the endpoint (1 meetings ... 5.2 high-frequency telemetry).
+    """
+    def decorator(cls: Type[APIRequestBuilder]) -> Type[APIRequestBuilder]:
+        cls.endpoint = endpoint
+        cls.tier = tier
+        ENDPOINT_REGISTRY[endpoint] = cls
+        return cls
+    return decorator
+
+
+class BuilderRegistry(Mapping):
+    """
+    Read-only endpoint -> builder mapping creating each builder (and its compiled converters)
+    on first access, so a run touching one endpoint does not build all of them.
+    """
+    def __init__(self, registry: Optional[Dict[str, Type[APIRequestBuilder]]] = None):
+        self._registry = ENDPOINT_REGISTRY if registry is None else registry
+        self._instances: Dict[str, APIRequestBuilder] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, endpoint: str) -> APIRequestBuilder:
+        builder = self._instances.get(endpoint)
+        if builder is None:
+            builder_cls = self._registry[endpoint]
+            with self._lock:
+                builder = self._instances.get(endpoint)
+                if builder is None:
+                    builder = self._instances[endpoint] = builder_cls()
+        return builder
+
+    def __contains__(self, endpoint) -> bool:
+        return endpoint in self._registry
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._registry)
+
+    def __len__(self) -> int:
+        return len(self._registry)
+
+    def tier(self, endpoint: str) -> float:
+        """
+        Tier of the endpoint without creating its builder.
+        """
+        return self._registry[endpoint].tier
+
 ###############################################
 ### - Tier 1 - ################################
 ###############################################
 
+@register_builder("meetings", tier=1)
 class MeetingsRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'year', 'meeting_key'}
@@ -38,11 +245,15 @@ class MeetingsRequestBuilder(APIRequestBuilder):
             "meeting_official_name": "string"
         }
 
+    def get_natural_key(self):
+        return ("meeting_key",)
+
 
 ###############################################
 ### - Tier 2 - ################################
 ###############################################
 
+@register_builder("sessions", tier=2)
 class SessionsRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'year', 'meeting_key', 'session_key'}
@@ -67,11 +278,15 @@ class SessionsRequestBuilder(APIRequestBuilder):
             "session_type": "string"
         }
 
+    def get_natural_key(self):
+        return ("session_key",)
+
 
 ###############################################
 ### - Tier 3 - ################################
 ###############################################
 
+@register_builder("drivers", tier=3)
 class DriversRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'meeting_key', 'session_key'}
@@ -94,6 +309,10 @@ class DriversRequestBuilder(APIRequestBuilder):
             "team_name": "string"
         }
 
+    def get_natural_key(self):
+        return ("session_key", "driver_number")
+
+@register_builder("race_control", tier=3)
 class RaceControlRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'meeting_key', 'session_key'}
@@ -115,6 +334,10 @@ class RaceControlRequestBuilder(APIRequestBuilder):
             "sector": "Int64"
         }
 
+    def get_natural_key(self):
+        return ("session_key", "date", "category", "message")
+
+@register_builder("session_result", tier=3)
 class SessionResultRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'meeting_key', 'session_key'}
@@ -139,6 +362,10 @@ class SessionResultRequestBuilder(APIRequestBuilder):
             
         }
 
+    def get_natural_key(self):
+        return ("session_key", "driver_number")
+
+@register_builder("starting_grid", tier=3)
 class StartingGridRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'meeting_key', 'session_key'}
@@ -154,6 +381,10 @@ class StartingGridRequestBuilder(APIRequestBuilder):
             "position": "Int64"
         }
 
+    def get_natural_key(self):
+        return ("session_key", "driver_number")
+
+@register_builder("stints", tier=3)
 class StintsRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'meeting_key', 'session_key'}
@@ -175,6 +406,10 @@ class StintsRequestBuilder(APIRequestBuilder):
             "tyre_age_at_start": "Int64"
         }
 
+    def get_natural_key(self):
+        return ("session_key", "driver_number", "stint_number")
+
+@register_builder("team_radio", tier=3)
 class TeamRadioRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'meeting_key', 'session_key'}
@@ -190,6 +425,10 @@ class TeamRadioRequestBuilder(APIRequestBuilder):
             "recording_url": "string"
         }
 
+    def get_natural_key(self):
+        return ("session_key", "driver_number", "date")
+
+@register_builder("weather", tier=3)
 class WeatherRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'meeting_key', 'session_key'}
@@ -210,11 +449,15 @@ class WeatherRequestBuilder(APIRequestBuilder):
             "wind_direction": "float64"
         }
 
+    def get_natural_key(self):
+        return ("session_key", "date")
+
 
 ###############################################
 ### - Tier 4 - ################################
 ###############################################
 
+@register_builder("laps", tier=4)
 class LapsRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'meeting_key', 'session_key','driver_number'}
@@ -241,6 +484,10 @@ class LapsRequestBuilder(APIRequestBuilder):
             "st_speed": "Int64",
         }
 
+    def get_natural_key(self):
+        return ("session_key", "driver_number", "lap_number")
+
+@register_builder("overtakes", tier=4)
 class OvertakesRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'meeting_key', 'session_key'}
@@ -259,6 +506,10 @@ class OvertakesRequestBuilder(APIRequestBuilder):
             "position": "Int64"
         }
 
+    def get_natural_key(self):
+        return ("session_key", "date", "overtaking_driver_number", "overtaken_driver_number")
+
+@register_builder("pit", tier=4)
 class PitRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'meeting_key', 'session_key','driver_number'}
@@ -276,6 +527,10 @@ class PitRequestBuilder(APIRequestBuilder):
             
         }
 
+    def get_natural_key(self):
+        return ("session_key", "driver_number", "date")
+
+@register_builder("position", tier=4)
 class PositionRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'meeting_key', 'session_key','driver_number'}
@@ -291,11 +546,15 @@ class PositionRequestBuilder(APIRequestBuilder):
             "position": "Int64"
         }
 
+    def get_natural_key(self):
+        return ("session_key", "driver_number", "date")
+
 
 ###############################################
 ### - Tier 5.1 - ##############################
 ###############################################
 
+@register_builder("intervals", tier=5.1)
 class IntervalsRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'meeting_key', 'session_key'}
@@ -317,10 +576,22 @@ class IntervalsRequestBuilder(APIRequestBuilder):
             "interval": "float64"
         }
 
+    def get_compact_schema(self):
+        return {
+            "meeting_key": "category",
+            "session_key": "category",
+            # interval (sekundy z częściami dziesiętnymi) nie przechodzi dokładnie przez float32 - zostaje float64
+            "driver_number": "UInt8"
+        }
+
+    def get_natural_key(self):
+        return ("session_key", "driver_number", "date")
+
 ###############################################
 ### - Tier 5.2 - ##############################
 ###############################################
 
+@register_builder("car_data", tier=5.2)
 class CarDataRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'meeting_key', 'session_key'}
@@ -345,6 +616,23 @@ class CarDataRequestBuilder(APIRequestBuilder):
             "throttle": "Int64"
         }
 
+    def get_compact_schema(self):
+        return {
+            "meeting_key": "category",
+            "session_key": "category",
+            "driver_number": "UInt8",
+            "brake": "UInt8",
+            "drs": "UInt8",
+            "n_gear": "UInt8",
+            "rpm": "UInt16",
+            "speed": "UInt16",
+            "throttle": "UInt8"
+        }
+
+    def get_natural_key(self):
+        return ("session_key", "driver_number", "date")
+
+@register_builder("location", tier=5.2)
 class LocationRequestBuilder(APIRequestBuilder):
     def build_payload(self, params: Dict[str,Any]):
         allowed_keys = {'meeting_key', 'session_key'}
@@ -364,4 +652,17 @@ class LocationRequestBuilder(APIRequestBuilder):
             "x": "float64",
             "y": "float64",
             "z": "float64"
-        }
\ No newline at end of file
+        }
+
+    def get_compact_schema(self):
+        return {
+            "meeting_key": "category",
+            "session_key": "category",
+            "driver_number": "UInt8",
+            "x": "float32",
+            "y": "float32",
+            "z": "float32"
+        }
+
+    def get_natural_key(self):
+        return ("session_key", "driver_number", "date")
\ No newline at end of file
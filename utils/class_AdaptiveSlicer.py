@@ -0,0 +1,169 @@
+import json
+import threading
+import logging
+
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Zapis pliku stanu szeregowany w procesie (kilka endpointów może dzielić jeden plik)
+_SAVE_LOCK = threading.Lock()
+
+class AdaptiveSlicer:
+    """
+    Splits a date_start/date_end window into sub-requests whose width adapts to the observed row counts.
+    The width grows while responses stay below target_rows and shrinks when they exceed it
+    or the request fails. Learned widths are kept per (endpoint, session_key) and can be persisted
+    between runs in a JSON state file.
+    """
+    def __init__(
+        self,
+        initial_widths: Dict[str, float],
+        default_width: float = 360,
+        target_rows: int = 2000,
+        min_width: float = 1,
+        max_width: float = 3600,
+        grow_factor: float = 2.0,
+        shrink_factor: float = 0.5,
+        state_path: Optional[str] = None
+    ):
+        """
+        Args:
+            initial_widths (dict): Starting width in seconds per endpoint.
+            default_width (float, optional): Starting width for other endpoints. Defaults to 360.
+            target_rows (int, optional): Desired number of rows per response. Defaults to 2000.
+            min_width (float, optional): Smallest allowed width in seconds. Defaults to 1.
+            max_width (float, optional): Largest allowed width in seconds. Defaults to 3600.
+            grow_factor (float, optional): Max growth per observation. Defaults to 2.0.
+            shrink_factor (float, optional): Max shrink per observation. Defaults to 0.5.
+            state_path (str, optional): JSON file with learned widths. Defaults to None.
+        """
+        self.initial_widths = initial_widths
+        self.default_width = default_width
+        self.target_rows = target_rows
+        self.min_width = min_width
+        self.max_width = max_width
+        self.grow_factor = grow_factor
+        self.shrink_factor = shrink_factor
+        self.state_path = Path(state_path) if state_path else None
+        self._widths: Dict[str, float] = {}
+        self._updated = set()
+        self._lock = threading.Lock()
+
+        if self.state_path is not None and self.state_path.exists():
+            try:
+                with open(self.state_path, encoding="utf-8") as f:
+                    self._widths = {k: float(v) for k, v in json.load(f).items()}
+                logger.info(f"Loaded {len(self._widths)} learned slice widths from {self.state_path}.")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read slice width state {self.state_path}: {e}")
+
+    @staticmethod
+    def _key(endpoint: str, session_key: Any) -> str:
+        return f"{endpoint}|{session_key}"
+
+    def width(self, endpoint: str, session_key: Any = None) -> float:
+        """
+        Returns the current width (seconds) for the session, falling back to the endpoint's last learned width.
+        """
+        with self._lock:
+            return self._widths.get(
+                self._key(endpoint, session_key),
+                self._widths.get(self._key(endpoint, None), self.initial_widths.get(endpoint, self.default_width))
+            )
+
+    def _set_width(self, endpoint: str, session_key: Any, width: float) -> float:
+        width = min(self.max_width, max(self.min_width, width))
+        with self._lock:
+            self._widths[self._key(endpoint, session_key)] = width
+            self._widths[self._key(endpoint, None)] = width
+            self._updated.update((self._key(endpoint, session_key), self._key(endpoint, None)))
+        return width
+
+    def observe(self, endpoint: str, session_key: Any, width: float, rows: int) -> None:
+        """
+        Adjusts the width after a successful response of `rows` rows for a window of `width` seconds.
+        """
+        ratio = self.target_rows / rows if rows > 0 else self.grow_factor
+        factor = min(self.grow_factor, max(self.shrink_factor, ratio))
+        # Mała strefa tolerancji, żeby nie zmieniać szerokości przy każdym wywołaniu
+        if 0.8 <= factor <= 1.25:
+            return
+        new_width = self._set_width(endpoint, session_key, width * factor)
+        logger.debug("Slice width for %s/%s: %.1fs -> %.1fs (%d rows).", endpoint, session_key, width, new_width, rows)
+
+    def observe_failure(self, endpoint: str, session_key: Any, width: float) -> None:
+        new_width = self._set_width(endpoint, session_key, width * self.shrink_factor)
+        logger.info(f"Request failed, slice width for {endpoint}/{session_key} reduced to {new_width:.1f}s.")
+
+    def can_split(self, sub_params: Dict[str, Any]) -> bool:
+        try:
+            return self.window_seconds(sub_params) >= 2 * self.min_width
+        except (KeyError, ValueError):
+            return False
+
+    def iter_windows(self, endpoint: str, param_entry: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yields sub-requests covering param_entry; each window uses the width current at generation time.
+        """
+        if 'date_start' not in param_entry or 'date_end' not in param_entry:
+            yield param_entry
+            return
+
+        try:
+            start = datetime.fromisoformat(param_entry['date_start'])
+            end = datetime.fromisoformat(param_entry['date_end'])
+        except ValueError as e:
+            logger.error(f"Error parsing dates in param_entry: {param_entry}. Error: {e}")
+            yield param_entry
+            return
+
+        session_key = param_entry.get('session_key')
+        current = start
+        while current < end:
+            next_end = min(current + timedelta(seconds=self.width(endpoint, session_key)), end)
+            sub_params = param_entry.copy()
+            sub_params['date_start'] = current.isoformat()
+            sub_params['date_end'] = next_end.isoformat()
+            yield sub_params
+            current = next_end
+
+    @staticmethod
+    def window_seconds(sub_params: Dict[str, Any]) -> float:
+        return (
+            datetime.fromisoformat(sub_params['date_end']) - datetime.fromisoformat(sub_params['date_start'])
+        ).total_seconds()
+
+    @staticmethod
+    def split_window(sub_params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Splits a sub-request window into two halves.
+        """
+        start = datetime.fromisoformat(sub_params['date_start'])
+        end = datetime.fromisoformat(sub_params['date_end'])
+        middle = start + (end - start) / 2
+        first, second = sub_params.copy(), sub_params.copy()
+        first['date_start'], first['date_end'] = start.isoformat(), middle.isoformat()
+        second['date_start'], second['date_end'] = middle.isoformat(), end.isoformat()
+        return [first, second]
+
+    def save(self) -> None:
+        if self.state_path is None:
+            return
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            updated = {key: self._widths[key] for key in self._updated}
+        with _SAVE_LOCK:
+            # Tylko zmienione szerokości - wpisy innych endpointów z pliku zostają
+            try:
+                with open(self.state_path, encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {}
+            state.update(updated)
+            with open(self.state_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+        logger.info(f"Saved {len(state)} learned slice widths to {self.state_path}.")
@@ -0,0 +1,283 @@
+import json
+import hashlib
+import os
+import threading
+import logging
+
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+class CheckpointJournal:
+    """
+    Append-only JSON Lines journal of sub-requests whose rows are already written to the target.
+
+    Each record stores the parameter entry key, the flushed time window ('date_start'/'date_end',
+    None for entries without a window) and the chunk the rows were written in. A sub-request is
+    journaled as soon as every chunk holding its rows is written, so a chunk that failed to write
+    only leaves a gap - later written chunks are still journaled.
+    On restart, finished entries are skipped, partially loaded entries resume after the written
+    prefix and already written windows after a gap are skipped (see is_flushed).
+    A journal from a different parameter set is ignored.
+    """
+    def __init__(self, path: str, method: str, param_list: Iterable[Dict[str, Any]]):
+        self.path = Path(path)
+        self.fingerprint = self._fingerprint(method, param_list)
+        # Zapisane okna per wpis, scalone i posortowane: (początki, końce) - wyszukiwanie przez bisect
+        self._windows: Dict[str, Tuple[List[datetime], List[datetime]]] = {}
+        # Koniec ciągłego prefiksu wpisu (rekordy bez 'date_start') oraz wpisy bez okna czasowego (zakończone)
+        self._prefix_end: Dict[str, datetime] = {}
+        self._finished = set()
+        self._last_key: Tuple[Optional[Dict[str, Any]], Optional[str]] = (None, None)
+        self._lock = threading.Lock()
+
+        # Śledzenie wierszy: (entry_key, date_start, date_end, offset początku, offset końca wierszy sub-requestu)
+        self._pending = deque()
+        self._rows_fetched = 0
+        self._rows_chunked = 0
+        # Fragmenty w kolejności bufora: offsety początków (do bisect), indeksy, zakresy wierszy
+        self._chunk_starts: List[int] = []
+        self._chunk_ids: List[int] = []
+        self._chunk_ranges: Dict[int, Tuple[int, int]] = {}
+        self._flushed_chunks = set()
+        self._rows_flushed = 0
+
+        self._load()
+
+    @staticmethod
+    def _fingerprint(method: str, param_list: Iterable[Dict[str, Any]]) -> str:
+        """
+        sha256 of json.dumps({"method": ..., "params": [...]}, sort_keys=True), hashed entry by entry
+        so that a streamed plan is never materialized.
+        """
+        digest = hashlib.sha256(f'{{"method": {json.dumps(method)}, "params": ['.encode("utf-8"))
+        for i, param_entry in enumerate(param_list):
+            digest.update(((", " if i else "") + json.dumps(param_entry, sort_keys=True, default=str)).encode("utf-8"))
+        digest.update(b"]}")
+        return digest.hexdigest()
+
+    @staticmethod
+    def entry_key(param_entry: Dict[str, Any]) -> str:
+        return hashlib.sha1(json.dumps(param_entry, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _key_of(self, param_entry: Dict[str, Any]) -> str:
+        # Sub-requesty jednego wpisu przychodzą po kolei - klucz ostatniego wpisu liczony raz
+        last_entry, last_key = self._last_key
+        if last_entry is param_entry:
+            return last_key
+        key = self.entry_key(param_entry)
+        self._last_key = (param_entry, key)
+        return key
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            self._start_new()
+            return
+
+        with open(self.path, encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if header.get("fingerprint") != self.fingerprint:
+            logger.warning(f"Checkpoint {self.path} belongs to a different parameter set. Starting from scratch.")
+            self._start_new()
+            return
+
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Ostatnia linia mogła zostać ucięta przy awarii
+                logger.warning(f"Skipping corrupted checkpoint line: {line.strip()}")
+                continue
+            # Rekordy bez 'date_start' (starsze journale) oznaczają ciągły prefiks wpisu
+            self._add_window(record["entry"], record.get("date_start"), record["date_end"])
+        entries = len(self._finished | self._prefix_end.keys() | self._windows.keys())
+        logger.info(f"Resuming from checkpoint {self.path}: {entries} entries with flushed data.")
+
+    def _start_new(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"fingerprint": self.fingerprint}) + "\n")
+
+    def _has_progress(self, key: str) -> bool:
+        return key in self._finished or key in self._prefix_end or key in self._windows
+
+    def _add_window(self, key: str, date_start: Optional[str], date_end: Optional[str]) -> None:
+        """
+        Merges a written window into the entry's sorted, non-overlapping window list.
+        """
+        if date_end is None:
+            self._finished.add(key)
+            return
+        try:
+            end = datetime.fromisoformat(date_end)
+            start = datetime.fromisoformat(date_start) if date_start is not None else None
+        except (TypeError, ValueError):
+            logger.warning(f"Skipping checkpoint window with invalid dates: {date_start} - {date_end}")
+            return
+        if start is None:
+            prefix_end = self._prefix_end.get(key)
+            self._prefix_end[key] = end if prefix_end is None or end > prefix_end else prefix_end
+            return
+
+        starts, ends = self._windows.setdefault(key, ([], []))
+        i = bisect_right(starts, start)
+        if i and ends[i - 1] >= start:
+            i -= 1
+            start = starts[i]
+            end = max(end, ends[i])
+        j = i
+        while j < len(starts) and starts[j] <= end:
+            end = max(end, ends[j])
+            j += 1
+        starts[i:j] = [start]
+        ends[i:j] = [end]
+
+    def _flushed_until(self, key: str, start: datetime) -> datetime:
+        """
+        End of the continuously written range that begins at start.
+        """
+        current = start
+        prefix_end = self._prefix_end.get(key)
+        if prefix_end is not None and prefix_end > current:
+            current = prefix_end
+        windows = self._windows.get(key)
+        if windows is not None:
+            starts, ends = windows
+            i = bisect_right(starts, current) - 1
+            if i >= 0 and ends[i] > current:
+                current = ends[i]
+        return current
+
+    def resume_entry(self, param_entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the part of param_entry that still has to be fetched, or None if it is finished.
+        """
+        key = self._key_of(param_entry)
+        if not self._has_progress(key):
+            return param_entry
+        if 'date_end' not in param_entry or key in self._finished:
+            return None
+        try:
+            start = datetime.fromisoformat(param_entry['date_start'])
+            with self._lock:
+                flushed_end = self._flushed_until(key, start)
+            if flushed_end >= datetime.fromisoformat(param_entry['date_end']):
+                return None
+        except (KeyError, TypeError, ValueError):
+            return param_entry
+        if flushed_end <= start:
+            return param_entry
+
+        resumed = param_entry.copy()
+        resumed['date_start'] = flushed_end.isoformat()
+        return resumed
+
+    def is_flushed(self, param_entry: Dict[str, Any], sub_params: Dict[str, Any]) -> bool:
+        """
+        True if the sub-request's window was already written by a previous run (windows after a gap).
+        """
+        key = self._key_of(param_entry)
+        if not self._has_progress(key) or 'date_start' not in sub_params or 'date_end' not in sub_params:
+            return False
+        try:
+            start = datetime.fromisoformat(sub_params['date_start'])
+            end = datetime.fromisoformat(sub_params['date_end'])
+            with self._lock:
+                return self._flushed_until(key, start) >= end
+        except (TypeError, ValueError):
+            return False
+
+    def record_fetched(self, param_entry: Dict[str, Any], sub_params: Dict[str, Any], rows: int) -> None:
+        """
+        Registers a fetched sub-request (in fetch order) and the number of rows it added to the buffer.
+        """
+        with self._lock:
+            rows_start = self._rows_fetched
+            self._rows_fetched += rows
+            self._pending.append((
+                self._key_of(param_entry), sub_params.get('date_start'), sub_params.get('date_end'),
+                rows_start, self._rows_fetched
+            ))
+
+    def record_chunk(self, chunk_idx: int, rows: int) -> None:
+        """
+        Registers a chunk taken from the buffer (in buffer order).
+        """
+        with self._lock:
+            self._chunk_starts.append(self._rows_chunked)
+            self._chunk_ids.append(chunk_idx)
+            self._chunk_ranges[chunk_idx] = (self._rows_chunked, self._rows_chunked + rows)
+            self._rows_chunked += rows
+
+    def _rows_written(self, rows_start: int, rows_end: int) -> Optional[bool]:
+        """
+        True if all chunks holding rows [rows_start, rows_end) are written, False if one is not (yet),
+        None if some of the rows are still in the buffer.
+        """
+        if rows_end > self._rows_chunked:
+            return None
+        if rows_end == rows_start:
+            return True
+        first = bisect_right(self._chunk_starts, rows_start) - 1
+        for chunk_idx in self._chunk_ids[first:]:
+            chunk_start, _ = self._chunk_ranges[chunk_idx]
+            if chunk_start >= rows_end:
+                break
+            if chunk_idx not in self._flushed_chunks:
+                return False
+        return True
+
+    def chunk_flushed(self, chunk_idx: int) -> None:
+        """
+        Marks a chunk as written. Sub-requests whose rows are all in written chunks are journaled,
+        also when an earlier chunk failed (its sub-requests stay pending and are refetched on restart).
+        """
+        with self._lock:
+            self._flushed_chunks.add(chunk_idx)
+            chunk_start, chunk_end = self._chunk_ranges[chunk_idx]
+            self._rows_flushed += chunk_end - chunk_start
+
+            records = []
+            still_pending = deque()
+            while self._pending:
+                pending = self._pending.popleft()
+                key, date_start, date_end, rows_start, rows_end = pending
+                written = self._rows_written(rows_start, rows_end)
+                if written is None:
+                    # Dalsze sub-requesty mają wiersze jeszcze w buforze
+                    self._pending.appendleft(pending)
+                    break
+                if not written:
+                    still_pending.append(pending)
+                    continue
+                self._add_window(key, date_start, date_end)
+                records.append({"entry": key, "date_start": date_start, "date_end": date_end, "chunk": chunk_idx})
+            still_pending.extend(self._pending)
+            self._pending = still_pending
+
+            if records:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(record) + "\n" for record in records)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def complete(self) -> None:
+        """
+        Removes the journal after a run in which all fetched rows were written.
+        """
+        with self._lock:
+            unflushed = self._rows_fetched - self._rows_flushed
+            if unflushed > 0:
+                logger.warning(f"{unflushed} rows not confirmed as written. Keeping checkpoint {self.path}.")
+                return
+        self.path.unlink(missing_ok=True)
+        logger.info(f"Run completed. Checkpoint {self.path} removed.")
@@ -0,0 +1,254 @@
+from collections import deque
+from pathlib import Path
+from typing import Iterator, Optional
+
+import os
+import shutil
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import logging
+
+from .class_RunMetrics import RunMetrics
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+class DataBuffer:
+    """
+    Accumulates fetched DataFrames as a list of chunks.
+    Rows and bytes are counted on append, frames are concatenated only once per flush,
+    so filling the buffer from many small slices costs linear instead of quadratic copying.
+    """
+    def __init__(self, max_rows: int, max_bytes: Optional[int] = None, split_frames: bool = True):
+        """
+        Args:
+            max_rows (int): Number of rows that makes the buffer full.
+            max_bytes (int, optional): In-memory size (deep) that makes the buffer full. Defaults to None (no limit).
+            split_frames (bool, optional): Cut chunks at exactly max_rows rows. False keeps every appended frame
+                (one sub-request) whole, so a chunk may exceed max_rows by less than one frame. Defaults to True.
+        """
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.split_frames = split_frames
+        self._frames = deque()
+        self._frame_bytes = deque()
+        self._rows = 0
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return self._rows
+
+    @property
+    def empty(self) -> bool:
+        return self._rows == 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def append(self, df: pd.DataFrame) -> None:
+        if df is None or df.empty:
+            return
+        frame_bytes = int(df.memory_usage(deep=True).sum()) if self.max_bytes is not None else 0
+        self._frames.append(df)
+        self._frame_bytes.append(frame_bytes)
+        self._rows += len(df)
+        self._bytes += frame_bytes
+
+    def is_full(self) -> bool:
+        if self._rows >= self.max_rows:
+            return True
+        return self.max_bytes is not None and self._rows > 0 and self._bytes >= self.max_bytes
+
+    def pop_chunk(self, max_rows: Optional[int] = None) -> pd.DataFrame:
+        """
+        Removes up to max_rows rows (all rows if None) from the front of the buffer
+        and returns them as a single DataFrame. Only the boundary frame is sliced
+        (with split_frames=False it is taken whole).
+        """
+        frames = []
+        rows = 0
+        while self._frames and (max_rows is None or rows < max_rows):
+            df = self._frames.popleft()
+            frame_bytes = self._frame_bytes.popleft()
+            if self.split_frames and max_rows is not None and rows + len(df) > max_rows:
+                need = max_rows - rows
+                head_bytes = frame_bytes * need // len(df)
+                self._frames.appendleft(df.iloc[need:])
+                self._frame_bytes.appendleft(frame_bytes - head_bytes)
+                df, frame_bytes = df.iloc[:need], head_bytes
+            frames.append(df)
+            rows += len(df)
+            self._rows -= len(df)
+            self._bytes -= frame_bytes
+
+        if not frames:
+            return pd.DataFrame()
+        if len(frames) == 1:
+            return frames[0].reset_index(drop=True)
+        return pd.concat(self._unify_categories(frames), ignore_index=True)
+
+    def pop_chunks(self, max_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Removes the rows of one flush (about max_rows rows, all rows if None) right away and returns
+        an iterator over its parts in FIFO order, to be loaded as one unit (DataSink.write_many).
+        The iterator no longer touches the buffer, so it may be consumed by a background writer.
+        For the in-memory buffer this is a single pop_chunk().
+        """
+        return iter([self.pop_chunk(max_rows=max_rows)] if not self.empty else [])
+
+    def close(self) -> None:
+        pass
+
+    @staticmethod
+    def _unify_categories(frames: list) -> list:
+        """
+        Gives categorical columns (compact schema) the same categories in all frames,
+        otherwise concat falls back to object dtype.
+        """
+        categorical = [
+            name for name, dtype in frames[0].dtypes.items()
+            if isinstance(dtype, pd.CategoricalDtype)
+            and all(isinstance(df.dtypes.get(name), pd.CategoricalDtype) for df in frames[1:])
+        ]
+        for name in categorical:
+            categories = pd.Index([]).append([df[name].cat.categories for df in frames]).unique()
+            frames = [df.assign(**{name: df[name].cat.set_categories(categories)}) for df in frames]
+        return frames
+
+
+class SpillingDataBuffer(DataBuffer):
+    """
+    DataBuffer with a hard in-memory byte budget: once the buffered frames exceed memory_budget bytes (deep size)
+    they are concatenated and spilled to an Arrow IPC segment (lz4) in spill_dir, and memory is released.
+    A flush streams the segments back one at a time, oldest first, followed by the in-memory rows, so max_rows
+    (the load size) may be far larger than what fits in memory. Peak buffer memory is about 2 x memory_budget
+    (concatenation while spilling). Frames Arrow cannot encode (mixed-type object columns) are spilled with pickle.
+    """
+    def __init__(
+        self,
+        max_rows: int,
+        memory_budget: int,
+        spill_dir: Optional[str] = None,
+        compression: Optional[str] = "lz4",
+        metrics: Optional[RunMetrics] = None,
+        split_frames: bool = True
+    ):
+        """
+        Args:
+            max_rows (int): Number of rows (in memory + spilled) that makes the buffer full.
+            memory_budget (int): In-memory size (bytes, deep) above which the buffer spills to disk.
+            spill_dir (str, optional): Directory for spill segments. Defaults to None (temporary directory).
+            compression (str, optional): Arrow IPC compression ('lz4', 'zstd' or None). Defaults to 'lz4'.
+            metrics (RunMetrics, optional): Collects spill timings and spilled bytes/segments. Defaults to None.
+            split_frames (bool, optional): See DataBuffer. Defaults to True.
+        """
+        super().__init__(max_rows=max_rows, max_bytes=memory_budget, split_frames=split_frames)
+        self.memory_budget = memory_budget
+        self.compression = compression
+        self.metrics = metrics if metrics is not None else RunMetrics()
+        self._own_dir = spill_dir is None
+        self.spill_dir = Path(spill_dir or tempfile.mkdtemp(prefix="openf1_spill_"))
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self._segments = deque()
+        self._spilled_rows = 0
+        self._spilled_bytes = 0
+        self._segment_idx = 0
+
+    def __len__(self) -> int:
+        return self._rows + self._spilled_rows
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    @property
+    def spilled_bytes(self) -> int:
+        return self._spilled_bytes
+
+    def append(self, df: pd.DataFrame) -> None:
+        super().append(df)
+        if self._rows > 0 and self._bytes > self.memory_budget:
+            self._spill()
+
+    def is_full(self) -> bool:
+        # Budżet pamięci nie wymusza zapisu - nadmiar trafia na dysk
+        return len(self) >= self.max_rows
+
+    def _spill(self) -> None:
+        in_memory = self._bytes
+        df = self.pop_chunk()
+        self._segment_idx += 1
+        path = self.spill_dir / f"segment-{os.getpid()}-{id(self):x}-{self._segment_idx:06d}"
+        with self.metrics.timer("spill"):
+            try:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                path = path.with_suffix(".arrow")
+                options = pa.ipc.IpcWriteOptions(compression=self.compression)
+                with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                    writer.write_table(table)
+                del table
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                path = path.with_suffix(".pkl")
+                df.to_pickle(path)
+        size = path.stat().st_size
+        self._segments.append((path, len(df)))
+        self._spilled_rows += len(df)
+        self._spilled_bytes += size
+        self.metrics.count("spilled_segments")
+        self.metrics.count("spilled_bytes", size)
+        logger.info(
+            f"Buffer over memory budget ({in_memory / (1024 * 1024):.1f} MB): spilled {len(df)} rows "
+            f"to {path.name} ({size / (1024 * 1024):.1f} MB on disk)."
+        )
+
+    def _read_segment(self, path: Path) -> pd.DataFrame:
+        try:
+            if path.suffix == ".pkl":
+                return pd.read_pickle(path)
+            with pa.memory_map(str(path)) as source:
+                return pa.ipc.open_file(source).read_all().to_pandas()
+        finally:
+            path.unlink(missing_ok=True)
+
+    def pop_chunks(self, max_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Removes spilled segments, then in-memory rows, until about max_rows rows (all rows if None),
+        and returns an iterator reading the segments back one at a time, followed by the in-memory rows.
+        """
+        segments = []
+        taken = 0
+        while self._segments and (max_rows is None or taken < max_rows):
+            path, rows = self._segments.popleft()
+            self._spilled_rows -= rows
+            self._spilled_bytes -= path.stat().st_size
+            taken += rows
+            segments.append(path)
+        tail = None
+        if self._rows and (max_rows is None or taken < max_rows):
+            tail = self.pop_chunk(max_rows=None if max_rows is None else max_rows - taken)
+        return self._iter_flush(segments, tail)
+
+    def _iter_flush(self, segments: list, tail: Optional[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        try:
+            while segments:
+                yield self._read_segment(segments.pop(0))
+            if tail is not None:
+                yield tail
+        finally:
+            # Flusz przerwany (błąd zapisu) - nieodczytane segmenty usuwamy
+            for path in segments:
+                path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        """
+        Removes remaining spill segments (and the spill directory if it was created by the buffer).
+        """
+        while self._segments:
+            path, _ = self._segments.popleft()
+            path.unlink(missing_ok=True)
+        self._spilled_rows = 0
+        self._spilled_bytes = 0
+        if self._own_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
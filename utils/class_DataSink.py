@@ -0,0 +1,194 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence
+
+import uuid
+import logging
+
+import pandas as pd
+import pyarrow as pa
+
+from .class_APIRequestBuilder import ARROW_TYPES
+from .class_RunMetrics import RunMetrics
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+class DataSink(ABC):
+    """
+    Target of buffered chunks (Snowflake table, local Parquet dataset, ...).
+    """
+    @abstractmethod
+    def write(self, df: pd.DataFrame) -> bool:
+        """
+        Writes a chunk. Returns True once the chunk is durably stored.
+        """
+        pass
+
+    def write_many(self, chunks: Iterable[pd.DataFrame]) -> bool:
+        """
+        Writes the parts of one buffer flush (e.g. spilled segments, read one at a time) as a single load.
+        The default writes every part separately; sinks override it where one load is cheaper.
+        """
+        success = True
+        for df in chunks:
+            success = self.write(df) and success
+        return success
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+###############################################
+### - Local Parquet - #########################
+###############################################
+
+class ParquetSink(DataSink):
+    """
+    Local Parquet dataset partitioned hive-style by endpoint, meeting_key and session_key:
+        <root_dir>/endpoint=<endpoint>/meeting_key=<m>/session_key=<s>/part-<run_id>-<chunk>.parquet
+    Every chunk is written as complete files (durable right after write()), with zstd compression
+    and at most row_group_size rows per row group. Column types come from the builder schema.
+    write_many() streams all parts of a flush into one file per partition (one row group set per part).
+    """
+    def __init__(
+        self,
+        root_dir: str,
+        endpoint: str,
+        schema: Optional[Dict[str, str]] = None,
+        partition_cols: Sequence[str] = ("meeting_key", "session_key"),
+        row_group_size: int = 128 * 1024,
+        compression: str = "zstd",
+        metrics: Optional[RunMetrics] = None
+    ):
+        """
+        Args:
+            root_dir (str): Dataset root directory.
+            endpoint (str): Endpoint name (first partition level).
+            schema (dict, optional): Builder schema (converter output_schema) used to type the Arrow columns. Defaults to None.
+            partition_cols (tuple, optional): Partition columns below the endpoint. Defaults to (meeting_key, session_key).
+            row_group_size (int, optional): Max rows per Parquet row group. Defaults to 131072.
+            compression (str, optional): Parquet compression codec. Defaults to 'zstd'.
+            metrics (RunMetrics, optional): Collects write timings and written rows. Defaults to None.
+        """
+        self.root_dir = Path(root_dir) / f"endpoint={endpoint}"
+        self.endpoint = endpoint
+        self.arrow_types = {name: ARROW_TYPES[dtype] for name, dtype in (schema or {}).items() if dtype in ARROW_TYPES}
+        self.partition_cols = list(partition_cols)
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.run_id = uuid.uuid4().hex[:12]
+        self._chunk_idx = 0
+        self.rows_written = 0
+        self.metrics = metrics if metrics is not None else RunMetrics()
+
+    def _to_table(self, df: pd.DataFrame) -> pa.Table:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        for i, field in enumerate(table.schema):
+            target = self.arrow_types.get(field.name)
+            if target is not None and field.type != target:
+                try:
+                    table = table.set_column(i, pa.field(field.name, target), table.column(i).cast(target))
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                    # Kolumna nie zmieściła się w wąskim typie (compact schema) - zostaje typ z pandas
+                    logger.warning(f"[Parquet] Column '{field.name}' kept as {field.type}: {e}")
+        return table
+
+    @staticmethod
+    def _partition_value(value) -> str:
+        return "__HIVE_DEFAULT_PARTITION__" if pd.isna(value) else str(value)
+
+    def write(self, df: pd.DataFrame) -> bool:
+        return self.write_many([df])
+
+    def write_many(self, chunks: Iterable[pd.DataFrame]) -> bool:
+        # Import odroczony - pyarrow.parquet potrzebny tylko w sinku Parquet
+        import pyarrow.parquet as pq
+
+        self._chunk_idx += 1
+        writers: Dict[Path, "pq.ParquetWriter"] = {}
+        rows = 0
+        try:
+            with self.metrics.timer("write"):
+                for df in chunks:
+                    if df.empty:
+                        continue
+                    partition_cols = [c for c in self.partition_cols if c in df.columns]
+                    groups = df.groupby(partition_cols, dropna=False, sort=False, observed=True) if partition_cols else [((), df)]
+                    for key, part in groups:
+                        key = key if isinstance(key, tuple) else (key,)
+                        directory = self.root_dir.joinpath(
+                            *(f"{col}={self._partition_value(value)}" for col, value in zip(partition_cols, key))
+                        )
+                        path = directory / f"part-{self.run_id}-{self._chunk_idx:06d}.parquet"
+                        table = self._to_table(part.drop(columns=partition_cols))
+                        writer = writers.get(path)
+                        if writer is None:
+                            directory.mkdir(parents=True, exist_ok=True)
+                            writer = writers[path] = pq.ParquetWriter(path, table.schema, compression=self.compression)
+                        elif table.schema != writer.schema:
+                            # Kolejne części fluszu (np. kolumna z samymi null) - typy z pierwszej części
+                            table = table.select(writer.schema.names).cast(writer.schema)
+                        writer.write_table(table, row_group_size=self.row_group_size)
+                    rows += len(df)
+                for writer in writers.values():
+                    writer.close()
+                writers.clear()
+
+        except Exception as e:
+            for path, writer in writers.items():
+                # Niedokończone pliki usuwamy - w zbiorze zostają tylko kompletne fragmenty
+                writer.close()
+                path.unlink(missing_ok=True)
+            self.metrics.count("write_failures")
+            logger.error(f"[Parquet] ❌ Error while writing chunk {self._chunk_idx} to {self.root_dir}: {e}")
+            return False
+
+        if not rows:
+            return True
+        self.rows_written += rows
+        self.metrics.count("rows_written", rows)
+        self.metrics.count("chunks_written")
+        logger.info(f"[Parquet] ✅ Chunk {self._chunk_idx} ({rows} rows) written to {self.root_dir}")
+        return True
+
+    def close(self) -> None:
+        logger.info(f"[Parquet] {self.rows_written} rows written to {self.root_dir} in {self._chunk_idx} chunks.")
+
+
+###############################################
+### - Null (benchmarks) - #####################
+###############################################
+
+class NullSink(DataSink):
+    """
+    Discards chunks (only counts them) - measures the fetch pipeline without any storage cost.
+    """
+    def __init__(self, metrics: Optional[RunMetrics] = None):
+        self.metrics = metrics if metrics is not None else RunMetrics()
+        self.rows_written = 0
+        self.chunks_written = 0
+
+    def write(self, df: pd.DataFrame) -> bool:
+        self.rows_written += len(df)
+        self.chunks_written += 1
+        self.metrics.count("rows_written", len(df))
+        self.metrics.count("chunks_written")
+        return True
+
+    def write_many(self, chunks: Iterable[pd.DataFrame]) -> bool:
+        rows = sum(len(df) for df in chunks)
+        self.rows_written += rows
+        self.chunks_written += 1
+        self.metrics.count("rows_written", rows)
+        self.metrics.count("chunks_written")
+        return True
+
+    def close(self) -> None:
+        logger.info(f"[Null] {self.rows_written} rows discarded in {self.chunks_written} chunks.")
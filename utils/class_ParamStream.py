@@ -0,0 +1,70 @@
+import json
+import logging
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+class ParamStream:
+    """
+    Request plan read lazily from a JSON Lines file: the first line is the header ({"method": ...}),
+    every following line one parameter entry. Entries may be compact range records, e.g.
+        {"session_key": 9472, "driver_number": 1, "date_start": "...", "date_end": "...", "step": 15}
+    which are sliced into sub-requests lazily by the fetch loop.
+
+    The stream is re-iterable: every pass re-reads the file, applying the maps/filters added with
+    map()/filter(), so memory use does not depend on the size of the plan.
+    """
+    def __init__(self, path: str, transforms: Tuple[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]], ...] = ()):
+        """
+        Args:
+            path (str): JSON Lines plan file.
+            transforms (tuple, optional): Functions applied to every entry in order; None drops the entry. Defaults to ().
+        """
+        self.path = Path(path)
+        self._transforms = transforms
+        self._len: Optional[int] = None
+
+    def read_header(self) -> Dict[str, Any]:
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    return json.loads(line)
+        return {}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with open(self.path, encoding="utf-8") as f:
+            header_seen = False
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                if not header_seen:
+                    header_seen = True
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"Invalid JSON in {self.path} line {line_no}: {e}") from e
+                for transform in self._transforms:
+                    entry = transform(entry)
+                    if entry is None:
+                        break
+                else:
+                    yield entry
+
+    def __len__(self) -> int:
+        # Liczenie = jeden dodatkowy przebieg po pliku (wynik zapamiętany)
+        if self._len is None:
+            self._len = sum(1 for _ in self)
+        return self._len
+
+    def map(self, transform: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]) -> "ParamStream":
+        """
+        New stream with transform applied to every entry (entries mapped to None are dropped).
+        """
+        return ParamStream(self.path, self._transforms + (transform,))
+
+    def filter(self, predicate: Callable[[Dict[str, Any]], bool]) -> "ParamStream":
+        return self.map(lambda entry: entry if predicate(entry) else None)
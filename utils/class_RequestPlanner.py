@@ -0,0 +1,195 @@
+import logging
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .class_APIClient import APIClient
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Filtry rozwiązywane lokalnie na podstawie metadanych (nie są parametrami API dla sessions/drivers)
+MEETING_FILTERS = {"circuit_short_name", "country_code", "country_name", "location", "meeting_name"}
+SESSION_FILTERS = {"session_name", "session_type"}
+
+# Klucz wpisu scalonego z kilku kierowców (coalesce)
+COALESCED_DRIVERS = "driver_numbers"
+
+class RequestPlanner:
+    """
+    Expands high-level specs into concrete request parameters using the metadata tiers:
+    meetings (Tier 1) and sessions (Tier 2) resolve the sessions, drivers (Tier 3) the driver numbers
+    for driver-filtered endpoints, and session date_start/date_end bound the time-series windows.
+
+    Example specs (params.json 'plan' list):
+        {"year": 2024}
+        {"meeting_key": 1229, "session_name": "Race"}
+        {"year": 2024, "circuit_short_name": "Monza", "driver_number": [1, 16]}
+    """
+    def __init__(self, client: APIClient):
+        self.client = client
+        self._metadata: Dict[Tuple[str, Tuple], pd.DataFrame] = {}
+
+    def _fetch_metadata(self, endpoint: str, params: Dict[str, Any]) -> pd.DataFrame:
+        """
+        Fetches a metadata tier once per run (and through the client's response cache, if any).
+        """
+        key = (endpoint, tuple(sorted(params.items())))
+        if key not in self._metadata:
+            self._metadata[key] = self.client.fetch_data(endpoint=endpoint, params=params)
+        return self._metadata[key]
+
+    def _uses_param(self, method: str, param: str) -> bool:
+        return bool(self.client.builder[method].build_payload({param: 0}))
+
+    @staticmethod
+    def _matches(row: pd.Series, spec: Dict[str, Any], keys: set) -> bool:
+        for key in keys & spec.keys():
+            allowed = spec[key] if isinstance(spec[key], list) else [spec[key]]
+            if row.get(key) not in allowed:
+                return False
+        return True
+
+    @staticmethod
+    def _to_param_date(value) -> str:
+        # Daty sesji (UTC) w formacie params.json, bez strefy
+        return pd.Timestamp(value).tz_convert("UTC").tz_localize(None).isoformat()
+
+    def _resolve_sessions(self, spec: Dict[str, Any]) -> pd.DataFrame:
+        if "session_key" in spec:
+            sessions = self._fetch_metadata("sessions", {"session_key": spec["session_key"]})
+        elif "meeting_key" in spec:
+            sessions = self._fetch_metadata("sessions", {"meeting_key": spec["meeting_key"]})
+        elif MEETING_FILTERS & spec.keys():
+            meetings = self._fetch_metadata("meetings", {k: spec[k] for k in ("year",) if k in spec})
+            meeting_keys = [
+                int(row["meeting_key"]) for _, row in meetings.iterrows() if self._matches(row, spec, MEETING_FILTERS)
+            ]
+            frames = [self._fetch_metadata("sessions", {"meeting_key": key}) for key in meeting_keys]
+            sessions = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        elif "year" in spec:
+            sessions = self._fetch_metadata("sessions", {"year": spec["year"]})
+        else:
+            raise ValueError(f"Plan spec needs one of year, meeting_key, session_key: {spec}")
+
+        if sessions.empty:
+            return sessions
+        mask = [self._matches(row, spec, SESSION_FILTERS) for _, row in sessions.iterrows()]
+        return sessions[mask]
+
+    def expand(self, method: str, specs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Returns the list of concrete parameter entries for `method`.
+        """
+        if method not in self.client.builder:
+            raise ValueError(f"Unknown endpoint: {method}")
+        if method in {"meetings", "sessions"}:
+            return [dict(spec) for spec in specs]
+
+        per_driver = self._uses_param(method, "driver_number")
+        windowed = self._uses_param(method, "date_start")
+        param_list = []
+        seen = set()
+
+        def add(entry: Dict[str, Any]) -> None:
+            # Nakładające się specyfikacje nie generują zduplikowanych zapytań
+            key = tuple(sorted(entry.items()))
+            if key not in seen:
+                seen.add(key)
+                param_list.append(entry)
+
+        for spec in specs:
+            sessions = self._resolve_sessions(spec)
+            logger.info(f"Plan spec {spec}: {len(sessions)} session(s).")
+
+            for _, session in sessions.iterrows():
+                entry = {"meeting_key": int(session["meeting_key"]), "session_key": int(session["session_key"])}
+                if windowed and pd.notna(session.get("date_start")) and pd.notna(session.get("date_end")):
+                    entry["date_start"] = self._to_param_date(session["date_start"])
+                    entry["date_end"] = self._to_param_date(session["date_end"])
+
+                if not per_driver:
+                    add(entry)
+                    continue
+
+                drivers = self._fetch_metadata("drivers", {"session_key": entry["session_key"]})
+                wanted = spec.get("driver_number")
+                wanted = set(wanted if isinstance(wanted, list) else [wanted]) if wanted is not None else None
+                for driver_number in drivers["driver_number"].dropna().unique() if not drivers.empty else []:
+                    if wanted is None or int(driver_number) in wanted:
+                        add({**entry, "driver_number": int(driver_number)})
+
+        logger.info(f"Plan expanded to {len(param_list)} request(s) for method '{method}'.")
+        return param_list
+
+    def driver_filter_column(self, method: str) -> Optional[str]:
+        """
+        Response column the API filters on for driver_number (e.g. 'overtaking_driver_number'),
+        None if the endpoint returns all drivers regardless of driver_number.
+        """
+        payload = self.client.builder[method].build_payload({"driver_number": 0})
+        return next(iter(payload), None)
+
+    def coalesce(self, method: str, param_list: List[Dict[str, Any]], min_drivers: int = 2) -> List[Dict[str, Any]]:
+        """
+        Merges entries that differ only in driver_number into one session-level entry
+        with 'driver_numbers': [...]. For endpoints filtering on driver_number the group needs at least
+        min_drivers drivers (the merged response holds all drivers, select_rows() keeps the requested ones);
+        for endpoints ignoring driver_number every call returns the same data, so any group is merged.
+        """
+        filtered = self.driver_filter_column(method) is not None
+        groups: Dict[Tuple, List[Dict[str, Any]]] = {}
+        for entry in param_list:
+            if "driver_number" in entry:
+                key = tuple(sorted((k, str(v)) for k, v in entry.items() if k != "driver_number"))
+                groups.setdefault(key, []).append(entry)
+
+        coalesced = []
+        emitted = set()
+        for entry in param_list:
+            if "driver_number" not in entry:
+                coalesced.append(entry)
+                continue
+            key = tuple(sorted((k, str(v)) for k, v in entry.items() if k != "driver_number"))
+            if key in emitted:
+                continue
+            group = groups[key]
+            drivers = sorted({int(e["driver_number"]) for e in group})
+            if len(drivers) < (min_drivers if filtered else 2):
+                coalesced.append(entry)
+                continue
+            emitted.add(key)
+            merged = {k: v for k, v in entry.items() if k != "driver_number"}
+            merged[COALESCED_DRIVERS] = drivers
+            coalesced.append(merged)
+
+        if len(coalesced) < len(param_list):
+            logger.info(f"Coalesced {len(param_list)} entries into {len(coalesced)} request(s) for method '{method}'.")
+        return coalesced
+
+    def select_rows(self, method: str, param_entry: Dict[str, Any], df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Keeps the rows of the drivers requested by a coalesced entry (what the per-driver calls would return).
+        """
+        column = self.driver_filter_column(method)
+        if COALESCED_DRIVERS not in param_entry or column is None or df is None or column not in df.columns:
+            return df
+        return df[df[column].isin(param_entry[COALESCED_DRIVERS])]
+
+    def fan_out(self, method: str, param_entry: Dict[str, Any], df: pd.DataFrame) -> List[Tuple[Dict[str, Any], pd.DataFrame]]:
+        """
+        Splits the result of a coalesced entry into (per-driver entry, rows) pairs.
+        """
+        if COALESCED_DRIVERS not in param_entry:
+            return [(param_entry, df)]
+        column = self.driver_filter_column(method)
+        base = {k: v for k, v in param_entry.items() if k != COALESCED_DRIVERS}
+        parts = []
+        for driver_number in param_entry[COALESCED_DRIVERS]:
+            driver_entry = {**base, "driver_number": driver_number}
+            if column is not None and df is not None and column in df.columns:
+                parts.append((driver_entry, df[df[column] == driver_number]))
+            else:
+                parts.append((driver_entry, df))
+        return parts
@@ -0,0 +1,165 @@
+import gzip
+import json
+import hashlib
+import os
+import threading
+import time
+import logging
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    Local content-addressed cache of API responses.
+    Key = sha256(endpoint + normalized payload), entries are stored as gzip-compressed JSON.
+    Entries expire after ttl_seconds (unless historical and never_expire_historical is set);
+    the least recently used entries are evicted when the cache exceeds max_bytes.
+    """
+    def __init__(
+        self,
+        cache_dir: str,
+        ttl_seconds: int = 24 * 3600,
+        max_bytes: int = 1024 * 1024 * 1024,
+        never_expire_historical: bool = True,
+        historical_age_days: int = 3
+    ):
+        """
+        Args:
+            cache_dir (str): Cache directory.
+            ttl_seconds (int, optional): Entry time-to-live. Defaults to 24 h.
+            max_bytes (int, optional): Max total size of the cache on disk. Defaults to 1 GB.
+            never_expire_historical (bool, optional): Entries whose time window ('date<') ended more than
+                historical_age_days ago never expire (the data will not change). Defaults to True.
+            historical_age_days (int, optional): Age after which a time window is historical. Defaults to 3.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.never_expire_historical = never_expire_historical
+        self.historical_age = timedelta(days=historical_age_days)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = sum(p.stat().st_size for p in self.cache_dir.glob("*/*.json.gz"))
+        logger.info(f"Response cache at {self.cache_dir} ({self._size / (1024 * 1024):.1f} MB).")
+
+    def __getstate__(self):
+        # Lock nie jest picklowalny - cache przekazywany do procesów shardów
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(endpoint: str, payload: Dict[str, Any]) -> str:
+        normalized = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+        return hashlib.sha256(f"{endpoint}?{normalized}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json.gz"
+
+    def _is_historical(self, payload: Dict[str, Any]) -> bool:
+        window_end = payload.get("date<")
+        if window_end is None:
+            return False
+        try:
+            end = datetime.fromisoformat(str(window_end))
+        except ValueError:
+            return False
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - end > self.historical_age
+
+    def get(self, endpoint: str, payload: Dict[str, Any]) -> Optional[Any]:
+        """
+        Returns the cached response or None (missing, expired or unreadable entry).
+        """
+        path = self._path(self.make_key(endpoint, payload))
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Corrupted cache entry {path.name}: {e}. Removing.")
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        if not entry.get("permanent") and time.time() - entry["created"] > self.ttl_seconds:
+            logger.debug("Cache entry expired for %s: %s", endpoint, payload)
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        # Aktualizacja czasu dostępu na potrzeby LRU
+        os.utime(path)
+        self.hits += 1
+        logger.debug("Cache hit for %s: %s", endpoint, payload)
+        return entry["data"]
+
+    def set(self, endpoint: str, payload: Dict[str, Any], data: Any) -> None:
+        path = self._path(self.make_key(endpoint, payload))
+        path.parent.mkdir(exist_ok=True)
+        entry = {
+            "endpoint": endpoint,
+            "payload": payload,
+            "created": time.time(),
+            "permanent": self.never_expire_historical and self._is_historical(payload),
+            "data": data
+        }
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(entry, f, default=str)
+
+        with self._lock:
+            old_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+            self._size += path.stat().st_size - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _remove(self, path: Path) -> None:
+        with self._lock:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+                self._size -= size
+            except FileNotFoundError:
+                pass
+
+    def _evict(self) -> None:
+        """
+        Removes least recently used entries until the cache is at 90% of max_bytes. Caller holds the lock.
+        """
+        target = int(self.max_bytes * 0.9)
+        entries = []
+        for p in self.cache_dir.glob("*/*.json.gz"):
+            try:
+                stat = p.stat()
+            except FileNotFoundError:
+                # Wpis usunięty równolegle przez inny proces
+                continue
+            entries.append((stat.st_mtime, stat.st_size, p))
+        entries.sort(key=lambda e: e[0])
+        removed = 0
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            self._size -= size
+            removed += 1
+        logger.info(f"Cache eviction: removed {removed} entries, size now {self._size / (1024 * 1024):.1f} MB.")
@@ -0,0 +1,212 @@
+import random
+import threading
+import time
+import logging
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised when the circuit breaker stays open (API keeps failing) for too many cooldown cycles.
+    """
+
+
+class ThrottledError(RuntimeError):
+    """
+    Raised when a call is still throttled (429) after max_throttled pauses - the API rate limit, not the request size.
+    """
+
+
+class ThrottleGate:
+    """
+    Pause shared by all fetch workers: after a 429 every worker waits until the gate reopens,
+    instead of each worker hitting the limit on its own.
+    """
+    def __init__(self):
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def wait(self) -> float:
+        """
+        Blocks while the gate is closed. Returns time spent waiting (seconds).
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                remaining = self._blocked_until - time.monotonic()
+            if remaining <= 0:
+                return waited
+            time.sleep(remaining)
+            waited += remaining
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive 5xx / network failures (counted across all workers).
+    While open, calls wait for the cooldown; then a single probe call is let through (half-open):
+    success (or a 4xx - the API answered) closes the circuit, failure opens it again and a 429
+    releases the probe, so the next call probes again. After max_open_cycles consecutive openings
+    without a success, calls fail with CircuitOpenError.
+    """
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0, max_open_cycles: int = 10):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_open_cycles = max_open_cycles
+        self.state = "closed"
+        self._failures = 0
+        self._open_cycles = 0
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> float:
+        """
+        Blocks while the circuit is open. Returns time spent waiting (seconds).
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                if self.state == "closed":
+                    return waited
+                if self._open_cycles >= self.max_open_cycles:
+                    raise CircuitOpenError(
+                        f"Circuit breaker open: API failing after {self._open_cycles} cooldowns of {self.cooldown:.0f}s"
+                    )
+                remaining = self._open_until - time.monotonic()
+                if remaining <= 0 and not self._probe_in_flight:
+                    # Half-open - przepuszczamy jedno zapytanie próbne
+                    self.state = "half_open"
+                    self._probe_in_flight = True
+                    return waited
+            wait = max(min(remaining, 1.0), 0.05)
+            time.sleep(wait)
+            waited += wait
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Circuit breaker closed, API responding again.")
+            self.state = "closed"
+            self._failures = 0
+            self._open_cycles = 0
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """
+        Ends the probe without a verdict (429) - the circuit stays half-open and the next call probes again.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self._failures >= self.failure_threshold):
+                self.state = "open"
+                self._open_cycles += 1
+                self._open_until = time.monotonic() + self.cooldown
+                self._probe_in_flight = False
+                logger.warning(
+                    f"Circuit breaker open after {self._failures} consecutive failures, "
+                    f"pausing API calls for {self.cooldown:.0f}s (cycle {self._open_cycles}/{self.max_open_cycles})."
+                )
+
+
+class RetryPolicy:
+    """
+    Retry rules of APIClient: jittered exponential backoff ("full jitter"), Retry-After support,
+    a shared 429 throttle gate and a circuit breaker for sustained server errors.
+    """
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+        max_retry_after: float = 300.0,
+        max_throttled: int = 20,
+        empty_retries: int = 1,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        max_open_cycles: int = 10
+    ):
+        """
+        Args:
+            max_attempts (int, optional): Attempts per request for 5xx, network and decode errors. Defaults to 5.
+            base_delay (float, optional): Backoff base in seconds (cap of the 1st retry delay). Defaults to 2.
+            max_delay (float, optional): Backoff cap in seconds. Defaults to 60.
+            max_retry_after (float, optional): Upper bound for honored Retry-After values. Defaults to 300.
+            max_throttled (int, optional): 429 responses tolerated per request (not counted as attempts). Defaults to 20.
+            empty_retries (int, optional): Extra attempts after an empty 200 before accepting it. Defaults to 1.
+            failure_threshold (int, optional): Consecutive failures that open the circuit. Defaults to 5.
+            cooldown (float, optional): Seconds the open circuit blocks calls. Defaults to 30.
+            max_open_cycles (int, optional): Consecutive openings before giving up. Defaults to 10.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.max_throttled = max_throttled
+        self.empty_retries = empty_retries
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_open_cycles = max_open_cycles
+        self._init_shared_state()
+
+    def _init_shared_state(self) -> None:
+        self.throttle = ThrottleGate()
+        self.breaker = CircuitBreaker(
+            failure_threshold=self.failure_threshold,
+            cooldown=self.cooldown,
+            max_open_cycles=self.max_open_cycles
+        )
+
+    def __getstate__(self):
+        # Locki nie są picklowalne - każdy proces shardu ma własną bramkę i breaker
+        state = self.__dict__.copy()
+        del state["throttle"], state["breaker"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_shared_state()
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Full-jitter delay before retry number `attempt` (1-based).
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        return self.backoff(attempt)
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """
+        Retry-After header as seconds (delta-seconds or HTTP-date); None if missing or invalid.
+        """
+        if not value:
+            return None
+        value = value.strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,109 @@
+from collections import deque
+from typing import List, Optional, Sequence
+
+import logging
+import numpy as np
+import pandas as pd
+
+from .class_RunMetrics import RunMetrics
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Maks. liczba posortowanych segmentów bieżącej generacji przed scaleniem
+MAX_ACTIVE_SEGMENTS = 16
+
+class RowDeduplicator:
+    """
+    Drops rows whose natural key (builder.get_natural_key()) was already seen in this run:
+    overlapping slices, retried or re-split windows, duplicated params.json entries.
+
+    Key columns are hashed to uint64 in one vectorized pass (pd.util.hash_pandas_object) and looked up
+    with np.searchsorted in a bounded rolling seen-set: sorted hash arrays grouped in generations of
+    max_keys / generations hashes, the oldest generation is dropped once the limit is reached.
+    Rows with a null key column are never dropped.
+    """
+    def __init__(
+        self,
+        key_columns: Sequence[str],
+        max_keys: int = 2_000_000,
+        generations: int = 4,
+        metrics: Optional[RunMetrics] = None
+    ):
+        """
+        Args:
+            key_columns (Sequence[str]): Natural key of the endpoint.
+            max_keys (int, optional): Approximate max number of remembered keys (8 bytes each). Defaults to 2,000,000.
+            generations (int, optional): Number of generations the seen-set is rolled in. Defaults to 4.
+            metrics (RunMetrics, optional): Counts dropped rows (duplicates_dropped). Defaults to None.
+        """
+        self.key_columns = list(key_columns)
+        self.generation_size = max(1, max_keys // max(1, generations))
+        self.metrics = metrics if metrics is not None else RunMetrics()
+        self.rows_dropped = 0
+        self._generations = deque(maxlen=max(1, generations))
+        self._active: List[np.ndarray] = []
+        self._active_size = 0
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._generations) + self._active_size
+
+    @staticmethod
+    def _contains(sorted_keys: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+        positions = np.searchsorted(sorted_keys, hashes)
+        positions[positions == len(sorted_keys)] = 0
+        return sorted_keys[positions] == hashes
+
+    def _seen(self, hashes: np.ndarray) -> np.ndarray:
+        seen = np.zeros(len(hashes), dtype=bool)
+        for keys in (*self._generations, *self._active):
+            seen |= self._contains(keys, hashes)
+        return seen
+
+    def _remember(self, hashes: np.ndarray) -> None:
+        """
+        Adds sorted, unique hashes to the current generation.
+        """
+        if not len(hashes):
+            return
+        self._active.append(hashes)
+        self._active_size += len(hashes)
+        if self._active_size < self.generation_size and len(self._active) < MAX_ACTIVE_SEGMENTS:
+            return
+        merged = np.concatenate(self._active)
+        merged.sort()
+        if self._active_size >= self.generation_size:
+            # Pełna generacja - deque(maxlen) usuwa najstarszą
+            self._generations.append(merged)
+            self._active = []
+            self._active_size = 0
+        else:
+            self._active = [merged]
+
+    def filter(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns df without rows already seen (in this frame or earlier ones) and remembers the new keys.
+        """
+        if df is None or df.empty or not self.key_columns:
+            return df
+        if any(column not in df.columns for column in self.key_columns):
+            return df
+
+        keys = df[self.key_columns]
+        complete = np.flatnonzero(keys.notna().all(axis=1).to_numpy())
+        hashes = pd.util.hash_pandas_object(keys.iloc[complete], index=False).to_numpy()
+        unique_hashes, first = np.unique(hashes, return_index=True)
+        new = ~self._seen(unique_hashes)
+
+        keep = np.ones(len(df), dtype=bool)
+        keep[complete] = False
+        keep[complete[first[new]]] = True
+        self._remember(unique_hashes[new])
+
+        dropped = len(df) - int(keep.sum())
+        if not dropped:
+            return df
+        self.rows_dropped += dropped
+        self.metrics.count("duplicates_dropped", dropped)
+        logger.debug("Dropped %d duplicate rows of %d.", dropped, len(df))
+        return df[keep]
@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+import time
+import logging
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Granice kubełków histogramu (sekundy), jak domyślne w klientach Prometheusa
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_PREFIX = "openf1_fetcher"
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-quantile (max for the +Inf bucket).
+        """
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(LATENCY_BUCKETS[i], self.max) if i < len(LATENCY_BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_s": round(self.sum, 4),
+            "mean_s": round(self.sum / self.count, 4) if self.count else 0.0,
+            "p50_s": self.quantile(0.5),
+            "p95_s": self.quantile(0.95),
+            "p99_s": self.quantile(0.99),
+            "max_s": round(self.max, 4)
+        }
+
+
+class RunMetrics:
+    """
+    Thread-safe per-run instrumentation: latency histograms per stage and counters.
+
+    Stages recorded by the pipeline:
+        http, decode, convert, throttle_wait, circuit_wait (APIClient),
+        rate_limit_wait, buffer_concat, spill, write_handoff (fetch loop),
+        connect, write, copy_into (sinks).
+    Counters: api_calls, retries, throttled, network_errors, server_errors, empty_responses, bytes_received,
+        sleep_seconds, rows_fetched, duplicates_dropped, rows_written, chunks_written, write_failures, cache_hits, cache_misses,
+        spilled_segments, spilled_bytes.
+    """
+    def __init__(self, labels: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            labels (dict, optional): Constant labels of the run (method, shard, ...). Defaults to None.
+        """
+        self.labels = {k: str(v) for k, v in (labels or {}).items()}
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._histograms: Dict[str, _Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = _Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        JSON-serializable run summary.
+        """
+        elapsed = self.elapsed()
+        with self._lock:
+            counters = dict(self._counters)
+            stages = {name: h.to_dict() for name, h in self._histograms.items()}
+        return {
+            "labels": self.labels,
+            "started": self.started,
+            "duration_s": round(elapsed, 3),
+            "rows_fetched_per_s": round(counters.get("rows_fetched", 0) / elapsed, 1) if elapsed else 0.0,
+            "rows_written_per_s": round(counters.get("rows_written", 0) / elapsed, 1) if elapsed else 0.0,
+            "counters": counters,
+            "stages": stages
+        }
+
+    @staticmethod
+    def _write_atomic(path: str, text: str) -> bool:
+        # Zapis przez plik tymczasowy - collector textfile nie może odczytać połowy pliku
+        target = Path(path)
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, target)
+        except OSError as e:
+            # Metryki nie mogą przerwać przebiegu
+            logger.warning(f"Could not write metrics file {path}: {e}")
+            return False
+        return True
+
+    def write_json(self, path: str) -> None:
+        if self._write_atomic(path, json.dumps(self.summary(), indent=2)):
+            logger.info(f"Run summary written to {path}.")
+
+    def _format_labels(self, **extra) -> str:
+        labels = {**self.labels, **extra}
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+    def to_prometheus(self) -> str:
+        """
+        Prometheus text exposition format (for the node_exporter textfile collector).
+        """
+        elapsed = self.elapsed()
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {name: (list(h.buckets), h.count, h.sum) for name, h in self._histograms.items()}
+
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines = [f"# HELP {name} Duration of pipeline stages.", f"# TYPE {name} histogram"]
+        for stage, (buckets, count, total) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, n in zip(list(LATENCY_BUCKETS) + ["+Inf"], buckets):
+                cumulative += n
+                lines.append(f"{name}_bucket{self._format_labels(stage=stage, le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{self._format_labels(stage=stage)} {total:.6f}")
+            lines.append(f"{name}_count{self._format_labels(stage=stage)} {count}")
+
+        for counter, value in sorted(counters.items()):
+            metric = f"{METRIC_PREFIX}_{counter}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric}{self._format_labels()} {value}"]
+
+        for gauge, value in (("run_duration_seconds", elapsed), ("run_start_time_seconds", self.started)):
+            metric = f"{METRIC_PREFIX}_{gauge}"
+            lines += [f"# TYPE {metric} gauge", f"{metric}{self._format_labels()} {value:.3f}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        if self._write_atomic(path, self.to_prometheus()):
+            logger.info(f"Prometheus metrics written to {path}.")
+
+    def log_summary(self) -> None:
+        summary = self.summary()
+        counters = summary["counters"]
+        logger.info(
+            f"Run metrics: {summary['duration_s']:.1f}s, {counters.get('rows_fetched', 0):.0f} rows fetched "
+            f"({summary['rows_fetched_per_s']:.0f} rows/s), {counters.get('bytes_received', 0) / (1024 * 1024):.1f} MB received, "
+            f"{counters.get('api_calls', 0):.0f} API calls, {counters.get('retries', 0):.0f} retries, "
+            f"{counters.get('sleep_seconds', 0):.1f}s sleeping."
+        )
+        for stage, stats in sorted(summary["stages"].items(), key=lambda item: -item[1]["total_s"]):
+            logger.info(
+                f"  {stage:<16} n={stats['count']:<7} total={stats['total_s']:.2f}s "
+                f"mean={stats['mean_s'] * 1000:.1f}ms p95<={stats['p95_s'] * 1000:.0f}ms max={stats['max_s'] * 1000:.0f}ms"
+            )
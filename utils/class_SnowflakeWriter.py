@@ -0,0 +1,270 @@
+import snowflake.connector
+from snowflake.connector.pandas_tools import write_pandas
+from snowflake.connector.errors import OperationalError, DatabaseError
+
+import os
+import uuid
+import tempfile
+import logging
+
+from .class_DataSink import DataSink
+from .class_RunMetrics import RunMetrics
+
+# Inicjalizacja loggera
+logger = logging.getLogger(__name__)
+
+class SnowflakeWriter(DataSink):
+    """
+    Long-lived Snowflake writer: one connection per run, reused for every chunk.
+
+    Load modes:
+    - 'write_pandas': every chunk is loaded immediately with write_pandas (default).
+    - 'stage': every chunk is written to Parquet and PUT to a named stage,
+      a single COPY INTO loads all staged files in close().
+    write_many() (the parts of one buffer flush, e.g. spilled segments) PUTs every part to the stage
+    and loads them with one COPY INTO ('write_pandas') or leaves them for the final COPY ('stage').
+    Several writers (write-behind workers) can stage into one run_id with copy_on_close=False;
+    the owner of the run then loads all their files with a single copy_staged().
+    """
+    def __init__(
+        self,
+        conn_params,
+        table_name,
+        load_mode="write_pandas",
+        stage_name=None,
+        metrics=None,
+        run_id=None,
+        copy_on_close=True
+    ):
+        """
+        Args:
+            conn_params: dict with Snowflake connection parameters
+            table_name: str - target table name in Snowflake
+            load_mode: str - 'write_pandas' or 'stage'
+            stage_name: str - stage used in 'stage' mode (defaults to '<table_name>_STAGE')
+            metrics: RunMetrics - collects connect/write/copy_into timings (defaults to a private instance)
+            run_id: str - stage directory of the run, shared by writers staging for one COPY (defaults to a new id)
+            copy_on_close: bool - in 'stage' mode run COPY INTO in close() (False for writers sharing a run_id)
+        """
+        if load_mode not in {"write_pandas", "stage"}:
+            raise ValueError(f"Unknown load_mode: {load_mode}")
+
+        self.conn_params = conn_params
+        self.table_name = table_name
+        self.load_mode = load_mode
+        self.stage_name = stage_name or f"{table_name}_STAGE"
+        self.run_id = run_id or uuid.uuid4().hex
+        self.copy_on_close = copy_on_close
+        # Unikalne nazwy plików - kilka writerów może pisać do jednego katalogu stage
+        self._file_prefix = uuid.uuid4().hex[:8]
+        self._conn = None
+        self._staged_files = 0
+        self._flushes = 0
+        self._stage_ready = False
+        self.metrics = metrics if metrics is not None else RunMetrics()
+
+    # --- Połączenie ---
+
+    def _connect(self):
+        logger.info(f"[Snowflake] Opening connection for table: {self.table_name}")
+        with self.metrics.timer("connect"):
+            self._conn = snowflake.connector.connect(**self.conn_params)
+        self._stage_ready = False
+        return self._conn
+
+    def _get_connection(self):
+        if self._conn is None or self._conn.is_closed():
+            return self._connect()
+        return self._conn
+
+    def _run_with_reconnect(self, action):
+        """
+        Runs action(conn); on a connection failure reconnects once and retries.
+        """
+        try:
+            return action(self._get_connection())
+        except DatabaseError as e:
+            # OperationalError = błąd sieci/sesji; inne błędy tylko jeśli połączenie zostało zamknięte
+            if not isinstance(e, OperationalError) and self._conn is not None and not self._conn.is_closed():
+                raise
+            logger.warning(f"[Snowflake] Connection lost ({e}). Reconnecting...")
+            return action(self._connect())
+
+    # --- Zapis ---
+
+    def write(self, df):
+        """
+        Writes (or stages) a DataFrame chunk.
+        Returns:
+            bool: True if write succeeded, False otherwise
+        """
+        logger.info(f"[Snowflake] Starting write to table: {self.table_name} (rows: {len(df)}, mode: {self.load_mode})")
+
+        try:
+            if self.load_mode == "stage":
+                self._run_with_reconnect(lambda conn: self._put_to_stage(conn, df))
+                self.metrics.count("chunks_written")
+                return True
+            return self._run_with_reconnect(lambda conn: self._write_pandas(conn, df))
+
+        except Exception as e:
+            self.metrics.count("write_failures")
+            logger.error(f"[Snowflake] ❌ Error while writing to table {self.table_name}: {e}")
+            return False
+
+    def _write_pandas(self, conn, df):
+        with self.metrics.timer("write"):
+            success, nchunks, nrows, _ = write_pandas(
+                conn=conn,
+                df=df,
+                table_name=self.table_name,
+                auto_create_table=True,
+                use_logical_type=True
+            )
+
+        if success:
+            self.metrics.count("rows_written", nrows)
+            self.metrics.count("chunks_written")
+            logger.info(f"[Snowflake] ✅ Successfully loaded {nrows} rows in {nchunks} chunks into table {self.table_name}")
+        else:
+            self.metrics.count("write_failures")
+            logger.warning(f"[Snowflake] ⚠️ Write operation failed for table {self.table_name}")
+
+        return success
+
+    def _ensure_stage(self, conn):
+        if self._stage_ready:
+            return
+        cursor = conn.cursor()
+        cursor.execute(f'CREATE STAGE IF NOT EXISTS "{self.stage_name}"')
+        cursor.execute(
+            f'CREATE FILE FORMAT IF NOT EXISTS "{self.stage_name}_PARQUET" '
+            f'TYPE = PARQUET USE_LOGICAL_TYPE = TRUE'
+        )
+        self._stage_ready = True
+
+    def write_many(self, chunks):
+        """
+        Loads the parts of one buffer flush as a single load (see class docstring).
+        Returns:
+            bool: True if all parts were loaded (or staged in 'stage' mode), False otherwise
+        """
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        second = next(chunks, None)
+        if first is None:
+            return True
+        if second is None:
+            return self.write(first)
+
+        self._flushes += 1
+        prefix = f"{self.run_id}/" if self.load_mode == "stage" else f"{self.run_id}/flush_{self._flushes:06d}/"
+        staged = 0
+        try:
+            for df in (first, second, *chunks):
+                # Ponowienie po utracie połączenia per część - iteratora części nie da się przewinąć
+                self._run_with_reconnect(lambda conn: self._put_to_stage(conn, df, prefix))
+                staged += 1
+                if self.load_mode == "stage":
+                    self.metrics.count("chunks_written")
+            if self.load_mode == "stage":
+                return True
+            self._run_with_reconnect(lambda conn: self._copy_from_stage(conn, prefix))
+            self.metrics.count("chunks_written")
+            return True
+
+        except Exception as e:
+            self.metrics.count("write_failures")
+            logger.error(f"[Snowflake] ❌ Error while loading {staged} staged parts into table {self.table_name}: {e}")
+            if self.load_mode != "stage":
+                self._remove_from_stage(prefix)
+            return False
+
+    def _put_to_stage(self, conn, df, prefix=None):
+        self._ensure_stage(conn)
+        prefix = prefix or f"{self.run_id}/"
+        file_name = f"chunk_{self._file_prefix}_{self._staged_files:06d}.parquet"
+
+        with self.metrics.timer("write"), tempfile.TemporaryDirectory() as tmp_dir:
+            local_path = os.path.join(tmp_dir, file_name)
+            df.to_parquet(local_path, index=False, compression="snappy")
+            conn.cursor().execute(
+                f"PUT 'file://{local_path}' @\"{self.stage_name}\"/{prefix} "
+                f"AUTO_COMPRESS = FALSE OVERWRITE = TRUE"
+            )
+
+        self._staged_files += 1
+        logger.info(f"[Snowflake] ✅ Staged {len(df)} rows as {file_name} (@{self.stage_name}/{prefix})")
+        return True
+
+    def _remove_from_stage(self, prefix):
+        # Pliki nieudanego fluszu nie mogą trafić do późniejszego COPY INTO
+        try:
+            self._get_connection().cursor().execute(f'REMOVE @"{self.stage_name}"/{prefix}')
+        except Exception as e:
+            logger.warning(f"[Snowflake] Could not remove staged files @{self.stage_name}/{prefix}: {e}")
+
+    def _copy_from_stage(self, conn, prefix=None):
+        prefix = prefix or f"{self.run_id}/"
+        stage_path = f'@"{self.stage_name}"/{prefix}'
+        file_format = f'"{self.stage_name}_PARQUET"'
+        cursor = conn.cursor()
+        with self.metrics.timer("copy_into"):
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS "{self.table_name}" USING TEMPLATE ('
+                f'SELECT ARRAY_AGG(OBJECT_CONSTRUCT(*)) FROM TABLE('
+                f"INFER_SCHEMA(LOCATION => '{stage_path}', FILE_FORMAT => '{file_format}')))"
+            )
+            cursor.execute(
+                f'COPY INTO "{self.table_name}" FROM {stage_path} '
+                f'FILE_FORMAT = (FORMAT_NAME = {file_format}) '
+                f'MATCH_BY_COLUMN_NAME = CASE_SENSITIVE PURGE = TRUE'
+            )
+            # Jeden wiersz wyniku COPY INTO na załadowany plik
+            results = cursor.fetchall()
+            nrows = sum(row[3] for row in results if len(row) > 3 and isinstance(row[3], int))
+        self.metrics.count("rows_written", nrows)
+        logger.info(f"[Snowflake] ✅ COPY INTO {self.table_name} loaded {nrows} rows from {len(results)} staged files")
+        if prefix == f"{self.run_id}/":
+            self._staged_files = 0
+        return True
+
+    def flush(self):
+        """
+        In 'stage' mode loads all staged files with a single COPY INTO. No-op in 'write_pandas' mode.
+        Returns:
+            bool: True if load succeeded (or nothing to load), False otherwise
+        """
+        if self.load_mode != "stage" or self._staged_files == 0:
+            return True
+        return self.copy_staged()
+
+    def copy_staged(self):
+        """
+        Loads every file staged under run_id (also by other writers sharing it) with one COPY INTO.
+        Returns:
+            bool: True if load succeeded, False otherwise
+        """
+        try:
+            return self._run_with_reconnect(self._copy_from_stage)
+        except Exception as e:
+            self.metrics.count("write_failures")
+            logger.error(f"[Snowflake] ❌ Error during COPY INTO {self.table_name}: {e}")
+            return False
+
+    def close(self):
+        """
+        Flushes staged files (unless copy_on_close is False) and closes the connection.
+        """
+        if self.copy_on_close:
+            self.flush()
+        if self._conn is None:
+            return
+        try:
+            self._conn.close()
+            logger.info(f"[Snowflake] Connection closed successfully")
+        except Exception as e:
+            logger.warning(f"[Snowflake] Warning when closing connection: {e}")
+        finally:
+            self._conn = None
+
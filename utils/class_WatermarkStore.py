@@ -0,0 +1,208 @@
+import glob
+import json
+import os
+import threading
+import logging
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Zapis pliku znaczników szeregowany w procesie (kilka endpointów może dzielić jeden plik)
+_SAVE_LOCK = threading.Lock()
+
+class WatermarkStore:
+    """
+    High-water marks of already loaded data, used to trim params.json to new data only (incremental loads).
+
+    - time-series entries (date_start/date_end): max loaded `date` per (endpoint, session_key, driver_number);
+      the entry is skipped if the watermark reaches date_end, otherwise date_start moves to the watermark;
+    - other entries with session_key: the entry is skipped once loaded;
+    - other entries (e.g. sessions by year/meeting_key): rows of already loaded sessions/meetings are dropped.
+
+    Watermarks are kept in a JSON file ({endpoint: {"dates": {...}, "entries": [...], "keys": [...]}})
+    and saved only after a run whose chunks were all written. Sharded runs save to per-shard files;
+    all sibling shard files are merged on load, so the shard count may change between runs.
+    """
+    def __init__(self, path: str, endpoint: str, base_path: Optional[str] = None):
+        """
+        Args:
+            path (str): Watermark file written by this run (per-shard path in sharded runs).
+            endpoint (str): Endpoint of the run.
+            base_path (str, optional): Unsharded path; base_path and base_path.shard* are merged on load.
+                Defaults to path.
+        """
+        self.path = Path(path)
+        self.endpoint = endpoint
+        self.base_path = base_path or path
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._dates: Dict[str, str] = {}
+        self._entries = set()
+        self._keys = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    # --- Stan ---
+
+    def _load(self) -> None:
+        for file in sorted({self.base_path, str(self.path), *glob.glob(f"{glob.escape(self.base_path)}.shard*")}):
+            if not os.path.exists(file):
+                continue
+            try:
+                with open(file, encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read watermark file {file}: {e}")
+                continue
+            if file == str(self.path):
+                self._state = state
+            endpoint_state = state.get(self.endpoint, {})
+            for key, value in endpoint_state.get("dates", {}).items():
+                if key not in self._dates or self._parse(value) > self._parse(self._dates[key]):
+                    self._dates[key] = value
+            self._entries.update(endpoint_state.get("entries", []))
+            self._keys.update(endpoint_state.get("keys", []))
+
+        if self._dates or self._entries or self._keys:
+            logger.info(
+                f"Loaded watermarks for '{self.endpoint}': {len(self._dates)} time-series, "
+                f"{len(self._entries)} loaded entries, {len(self._keys)} loaded keys."
+            )
+
+    def save(self) -> None:
+        """
+        Writes this endpoint's watermarks; sections of other endpoints are re-read from the file first,
+        so endpoints of a multi-endpoint run sharing the file do not overwrite each other.
+        """
+        with self._lock:
+            endpoint_state = {
+                "dates": dict(sorted(self._dates.items())),
+                "entries": sorted(self._entries),
+                "keys": sorted(self._keys)
+            }
+        with _SAVE_LOCK:
+            state = dict(self._state)
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    state.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+            state[self.endpoint] = endpoint_state
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self.path)
+        logger.info(f"Saved watermarks for '{self.endpoint}' to {self.path}.")
+
+    # --- Klucze ---
+
+    @staticmethod
+    def _parse(value: str) -> datetime:
+        """
+        Parses an ISO date as naive UTC (the watermark format), so offset-aware dates from params.json
+        compare with the stored watermarks.
+        """
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+
+    @staticmethod
+    def _format_like(mark: datetime, value: str) -> str:
+        """
+        Formats a naive UTC watermark like the params.json date `value` (same UTC offset, or naive).
+        """
+        tzinfo = datetime.fromisoformat(value).tzinfo
+        if tzinfo is None:
+            return mark.isoformat()
+        formatted = mark.replace(tzinfo=timezone.utc).astimezone(tzinfo).isoformat()
+        if value.endswith("Z") and formatted.endswith("+00:00"):
+            formatted = formatted[:-6] + "Z"
+        return formatted
+
+    @staticmethod
+    def _entry_key(param_entry: Dict[str, Any]) -> str:
+        return f"{param_entry.get('session_key', '')}|{param_entry.get('driver_number', '')}"
+
+    @staticmethod
+    def _row_key_column(df: pd.DataFrame) -> Optional[str]:
+        for column in ("session_key", "meeting_key"):
+            if column in df.columns:
+                return column
+        return None
+
+    @staticmethod
+    def _is_windowed(param_entry: Dict[str, Any]) -> bool:
+        return "date_start" in param_entry and "date_end" in param_entry
+
+    # --- Przycinanie planu ---
+
+    def trim(self, param_entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Returns None if the entry is fully loaded, a copy with a later date_start if partially loaded,
+        otherwise the entry itself.
+        """
+        key = self._entry_key(param_entry)
+        if self._is_windowed(param_entry):
+            watermark = self._dates.get(key)
+            if watermark is None:
+                return param_entry
+            try:
+                start = self._parse(param_entry["date_start"])
+                end = self._parse(param_entry["date_end"])
+                mark = self._parse(watermark)
+            except ValueError:
+                return param_entry
+            if mark >= end:
+                return None
+            if mark > start:
+                return {**param_entry, "date_start": self._format_like(mark, param_entry["date_start"])}
+            return param_entry
+
+        if "session_key" in param_entry and key in self._entries:
+            return None
+        return param_entry
+
+    def new_rows(self, param_entry: Dict[str, Any], df: pd.DataFrame) -> pd.DataFrame:
+        """
+        For entries not bound to a session (e.g. sessions by year) drops rows of already loaded sessions/meetings.
+        """
+        if df is None or df.empty or self._is_windowed(param_entry) or "session_key" in param_entry or not self._keys:
+            return df
+        column = self._row_key_column(df)
+        if column is None:
+            return df
+        return df[~df[column].astype("string").isin(self._keys)]
+
+    def observe(self, param_entry: Dict[str, Any], df: pd.DataFrame) -> None:
+        """
+        Advances the watermarks with fetched rows (persisted only by save()).
+        """
+        if df is None or df.empty:
+            return
+        key = self._entry_key(param_entry)
+        with self._lock:
+            if self._is_windowed(param_entry):
+                if "date" not in df.columns:
+                    return
+                latest = df["date"].max()
+                if pd.isna(latest):
+                    return
+                # Format dat jak w params.json: UTC bez strefy
+                latest = pd.Timestamp(latest)
+                latest = (latest.tz_convert("UTC").tz_localize(None) if latest.tzinfo else latest).isoformat()
+                if key not in self._dates or self._parse(latest) > self._parse(self._dates[key]):
+                    self._dates[key] = latest
+                return
+
+            if "session_key" in param_entry:
+                self._entries.add(key)
+            column = self._row_key_column(df)
+            if column is not None:
+                self._keys.update(str(v) for v in df[column].dropna().unique())
@@ -0,0 +1,124 @@
+import queue
+import threading
+import logging
+
+from typing import Callable, Iterable, Optional
+
+from .class_DataSink import DataSink
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class WriteBehindWriter(DataSink):
+    """
+    Producer/consumer wrapper around a writer (e.g. SnowflakeWriter).
+    write() puts the chunk into a bounded queue and returns immediately;
+    background worker threads, each with its own writer from writer_factory, load the chunks.
+    A full queue blocks write() (backpressure), close() drains the queue before returning.
+    """
+    def __init__(self, writer_factory: Callable, num_writers: int = 1, queue_size: int = 4):
+        """
+        Args:
+            writer_factory (Callable): Creates a writer with write(df) and close() methods (one per worker).
+            num_writers (int, optional): Number of background writer threads. Defaults to 1.
+            queue_size (int, optional): Max number of chunks waiting for a writer. Defaults to 4.
+        """
+        if num_writers < 1:
+            raise ValueError(f"num_writers must be >= 1, got {num_writers}")
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._closed = False
+        self.failed_chunks = 0
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, args=(writer_factory,), name=f"writer-{i}", daemon=True)
+            for i in range(1, num_writers + 1)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _worker(self, writer_factory: Callable) -> None:
+        writer = None
+        try:
+            writer = writer_factory()
+            while True:
+                item = self._queue.get()
+                try:
+                    if item is _STOP:
+                        return
+                    chunks, on_done = item
+                    success = writer.write_many(chunks)
+                    if not success:
+                        with self._lock:
+                            self.failed_chunks += 1
+                    if on_done is not None:
+                        on_done(success)
+                finally:
+                    self._queue.task_done()
+        except Exception as e:
+            logger.error(f"Writer thread {threading.current_thread().name} failed: {e}")
+            self._error = e
+            self._drain()
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _drain(self) -> None:
+        """
+        Empties the queue after a worker failure so that producers never block forever.
+        Stop markers meant for the remaining workers are put back.
+        """
+        stops = 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            stops += item is _STOP
+            self._queue.task_done()
+        for _ in range(stops):
+            self._queue.put(_STOP)
+
+    def write(self, df, on_done: Optional[Callable[[bool], None]] = None) -> bool:
+        """
+        Queues a chunk for background writing. Blocks while the queue is full.
+        on_done(success) is called from the writer thread once the chunk is written.
+        Returns:
+            bool: True if the chunk was queued.
+        """
+        return self.write_many([df], on_done=on_done)
+
+    def write_many(self, chunks: Iterable, on_done: Optional[Callable[[bool], None]] = None) -> bool:
+        """
+        Queues the parts of one buffer flush, loaded by one worker as a single load (DataSink.write_many).
+        Returns:
+            bool: True if the flush was queued.
+        """
+        if self._error is not None:
+            raise RuntimeError(f"Background writer failed: {self._error}") from self._error
+        if self._queue.full():
+            logger.info(f"Write queue full ({self._queue.maxsize} chunks). Waiting for writers...")
+        self._queue.put((chunks, on_done))
+        return True
+
+    def close(self) -> None:
+        """
+        Waits until all queued chunks are written, then stops the workers.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        for thread in self._threads:
+            if thread.is_alive():
+                self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+        if self.failed_chunks:
+            logger.warning(f"{self.failed_chunks} chunk(s) failed to write.")
+        if self._error is not None:
+            raise RuntimeError(f"Background writer failed: {self._error}") from self._error
+
@@ -1,13 +1,30 @@
 # Funkcja do buforowania i zapisu danych
 import logging
+import math
+import uuid
 import pandas as pd
 
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from datetime import datetime, timedelta
 from time import sleep
 
+from .class_AdaptiveSlicer import AdaptiveSlicer
 from .class_APIClient import APIClient
+from .class_CheckpointJournal import CheckpointJournal
+from .class_DataBuffer import DataBuffer, SpillingDataBuffer
+from .class_DataSink import DataSink, NullSink, ParquetSink
+from .class_ParamStream import ParamStream
+from .class_RequestPlanner import RequestPlanner
+from .class_ResponseCache import ResponseCache
+from .class_RetryPolicy import CircuitOpenError, RetryPolicy, ThrottledError
+from .class_RowDeduplicator import RowDeduplicator
+from .class_RunMetrics import RunMetrics
+from .class_TokenBucket import TokenBucket
+from .class_WatermarkStore import WatermarkStore
 from .utils_load_parameters import get_snowflake_connection, get_parameters
-from .utils_write_to_snowflake import write_to_snowflake
+from .class_WriteBehindWriter import WriteBehindWriter
+from .utils_sharding import DEFAULT_SHARD_BY, shard_of, shard_param_list, shard_path
 
 # Inicjalizacja loggera
 logger = logging.getLogger(__name__)
@@ -15,29 +32,251 @@ logger = logging.getLogger(__name__)
 def fetch_and_buffer_data(
     param_file_path,
     api_url: str,
-    buffer_size=5000
+    parameters: dict = None,
+    buffer_size=5000,
+    buffer_max_mb: float = None,
+    buffer_spill_mb: float = None,
+    spill_dir: str = None,
+    load_mode: str = "write_pandas",
+    sink: str = "snowflake",
+    sink_path: str = "./output",
+    writer_threads: int = 0,
+    write_queue_size: int = 4,
+    fetch_mode: str = "sequential",
+    max_workers: int = 4,
+    requests_per_second: float = 3.0,
+    response_cache: ResponseCache = None,
+    retry_policy: RetryPolicy = None,
+    columnar_decode: bool = False,
+    compact_schema: bool = False,
+    checkpoint_path: str = None,
+    incremental: bool = False,
+    coalesce_drivers: bool = False,
+    coalesce_min_drivers: int = 2,
+    dedup: bool = False,
+    dedup_max_keys: int = 2_000_000,
+    watermark_path: str = None,
+    adaptive_slicing: bool = False,
+    slice_target_rows: int = 2000,
+    slice_state_path: str = None,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    shard_by=DEFAULT_SHARD_BY,
+    progress_callback=None,
+    metrics_path: str = None,
+    metrics_prom_path: str = None,
+    session=None,
+    rate_limiter: TokenBucket = None,
+    log_every: int = 1
 ):
     """
     Fetches data from API using parameters, buffers it in a DataFrame, and writes to Snowflake in chunks.
     Splits date range into 15-second intervals if date_start and date_end are provided.
+    The parameter file holds either concrete 'params' entries or high-level 'plan' specs
+    expanded by RequestPlanner from the meetings/sessions/drivers metadata.
 
     Args:
         param_file_path (str): Path to the parameter file.
         api_url (str): API URL for data fetching.
+        parameters (dict, optional): Single-endpoint spec ({"method", "params" | "plan"}) used instead of
+            reading param_file_path (multi-endpoint runs). Defaults to None.
         buffer_size (int, optional): Number of rows to buffer before writing to Snowflake. Defaults to 1000.
+        buffer_max_mb (float, optional): In-memory buffer size (MB) that also triggers a write. Defaults to None (rows only).
+        buffer_spill_mb (float, optional): Hard in-memory budget (MB): above it buffered rows spill to Arrow IPC segments
+            on disk and are streamed to the sink at flush time, so buffer_size can exceed available memory.
+            Replaces buffer_max_mb. Defaults to None (no spilling).
+        spill_dir (str, optional): Directory for spill segments. Defaults to None (temporary directory).
+        sink (str, optional): 'snowflake', 'parquet' (local partitioned Parquet dataset) or 'null' (discard, benchmarks).
+            Defaults to 'snowflake'.
+        sink_path (str, optional): Root directory of the 'parquet' sink. Defaults to './output'.
+        load_mode (str, optional): 'write_pandas' (load every chunk) or 'stage' (PUT chunks to a stage,
+            one COPY INTO at the end). Defaults to 'write_pandas'.
+        writer_threads (int, optional): Number of background writer threads. 0 writes synchronously
+            in the fetch loop. Defaults to 0.
+        write_queue_size (int, optional): Max number of chunks waiting for background writers
+            before the fetch loop blocks. Defaults to 4.
+        fetch_mode (str, optional): 'sequential' (one call at a time, 2 s pause) or 'concurrent'
+            (bounded worker pool limited by a token bucket). Defaults to 'sequential'.
+        max_workers (int, optional): Number of worker threads in 'concurrent' mode. Defaults to 4.
+        requests_per_second (float, optional): API call rate limit in 'concurrent' mode. Defaults to 3.0.
+        response_cache (ResponseCache, optional): On-disk API response cache. Defaults to None (disabled).
+        retry_policy (RetryPolicy, optional): Backoff / 429 throttle / circuit breaker rules. Defaults to None (RetryPolicy()).
+        columnar_decode (bool, optional): Decode flat-schema endpoints from streamed CSV into typed Arrow columns.
+            Defaults to False.
+        compact_schema (bool, optional): Keep car_data/location/intervals in narrow dtypes (UInt8/UInt16, float32,
+            category) in the buffer and the Parquet sink. Defaults to False.
+        checkpoint_path (str, optional): Checkpoint journal file. A restarted run skips entries already written
+            and resumes partially written ones. Defaults to None (disabled).
+        incremental (bool, optional): Fetch only data newer than the watermarks in watermark_path
+            (max loaded date per endpoint/session/driver, loaded session keys for other tiers). Defaults to False.
+        watermark_path (str, optional): JSON file with the watermarks, updated after a run whose chunks were all written.
+            Defaults to None.
+        coalesce_drivers (bool, optional): Merge entries differing only in driver_number into one request per
+            session/window and keep the requested drivers' rows locally. Defaults to False.
+        coalesce_min_drivers (int, optional): Min drivers per group for endpoints filtering on driver_number
+            (laps, pit, position, overtakes). Defaults to 2.
+        dedup (bool, optional): Drop rows whose natural key (builder.get_natural_key()) was already fetched
+            in this run before they are buffered and written. Defaults to False.
+        dedup_max_keys (int, optional): Size of the rolling set of remembered key hashes (8 bytes each).
+            Defaults to 2,000,000.
+        adaptive_slicing (bool, optional): Adapt the sub-request window width to the returned row counts
+            instead of the fixed 15/60/360 s. Defaults to False.
+        slice_target_rows (int, optional): Desired rows per response in adaptive mode. Defaults to 2000.
+        slice_state_path (str, optional): JSON file to persist learned widths between runs. Defaults to None.
+        shard_index (int, optional): Shard processed by this run (0-based). Defaults to 0.
+        shard_count (int, optional): Total number of shards; 1 processes the whole param list. Defaults to 1.
+        shard_by (tuple, optional): Parameter keys used to assign entries to shards. Defaults to (session_key, driver_number).
+        progress_callback (callable, optional): Called with a progress dict after every sub-request. Defaults to None.
+        metrics_path (str, optional): JSON file for the run summary (stage latencies, rows/s, bytes, retries).
+            Defaults to None (summary only logged).
+        metrics_prom_path (str, optional): Prometheus textfile (node_exporter textfile collector). Defaults to None.
+        log_every (int, optional): 1 logs every sub-request at INFO; N > 1 logs them at DEBUG and a progress
+            summary every N sub-requests at INFO. Defaults to 1.
+        session (requests.Session, optional): HTTP connection pool shared with other endpoints. Defaults to None.
+        rate_limiter (TokenBucket, optional): Rate limit shared with other endpoints (concurrent mode).
+            Defaults to None (own limiter of requests_per_second).
+
+    Returns:
+        dict: Run summary (entries_total, entries_started, sub_requests, rows, metrics).
     """
+    if fetch_mode not in {"sequential", "concurrent"}:
+        raise ValueError(f"Unknown fetch_mode: {fetch_mode}")
+    if sink not in {"snowflake", "parquet", "null"}:
+        raise ValueError(f"Unknown sink: {sink}")
     
-    parameters = get_parameters(input_path=param_file_path)
+    if parameters is None:
+        parameters = get_parameters(input_path=param_file_path)
     method = parameters["method"]
-    param_list = parameters["params"]
     table_name = f"BRONZE_{method.upper()}"
+    metrics = RunMetrics(labels={"method": method, "shard": shard_index} if shard_count > 1 else {"method": method})
+    if rate_limiter is None and fetch_mode == "concurrent":
+        rate_limiter = TokenBucket(rate=requests_per_second)
+    client = APIClient(
+        api_url=api_url,
+        pool_size=max(max_workers, 1),
+        cache=response_cache,
+        columnar_decode=columnar_decode,
+        compact_schema=compact_schema,
+        metrics=metrics,
+        retry_policy=retry_policy,
+        session=session,
+        rate_limiter=rate_limiter
+    )
+    cache_hits_start, cache_misses_start = (response_cache.hits, response_cache.misses) if response_cache is not None else (0, 0)
+
+    planner = RequestPlanner(client)
+    if "plan" in parameters:
+        param_list = planner.expand(method, parameters["plan"])
+    else:
+        param_list = parameters["params"]
+
+    watermark_base_path = watermark_path
+    if shard_count > 1:
+        checkpoint_path = shard_path(checkpoint_path, shard_index, shard_count)
+        slice_state_path = shard_path(slice_state_path, shard_index, shard_count)
+        metrics_path = shard_path(metrics_path, shard_index, shard_count)
+        metrics_prom_path = shard_path(metrics_prom_path, shard_index, shard_count)
+        watermark_path = shard_path(watermark_path, shard_index, shard_count)
+
+    watermarks = None
+    if incremental:
+        if not watermark_path:
+            raise ValueError("Incremental mode needs a watermark_path")
+        watermarks = WatermarkStore(path=watermark_path, endpoint=method, base_path=watermark_base_path)
+        if isinstance(param_list, ParamStream):
+            param_list = param_list.map(watermarks.trim)
+        else:
+            planned = len(param_list)
+            param_list = [entry for entry in map(watermarks.trim, param_list) if entry is not None]
+            logger.info(f"Incremental mode: {len(param_list)} of {planned} entries have data newer than the watermarks.")
+
+    if coalesce_drivers:
+        if isinstance(param_list, ParamStream):
+            # Grupowanie kierowców wymaga całego planu w pamięci
+            logger.warning("Coalescing drivers loads the streamed plan into memory.")
+            param_list = list(param_list)
+        # Jedno zapytanie na sesję/okno zamiast jednego na kierowcę, podział wyniku lokalnie
+        param_list = planner.coalesce(method, param_list, min_drivers=coalesce_min_drivers)
+
+    if shard_count > 1 and isinstance(param_list, ParamStream):
+        param_list = param_list.filter(lambda entry: shard_of(entry, shard_count, shard_by) == shard_index)
+    elif shard_count > 1:
+        all_params = len(param_list)
+        param_list = shard_param_list(param_list, shard_index=shard_index, shard_count=shard_count, shard_by=shard_by)
+        logger.info(f"Shard {shard_index}/{shard_count}: {len(param_list)} of {all_params} entries.")
+    # Dla planu strumieniowego: jeden przebieg liczący po pliku, bez trzymania wpisów w pamięci
     total_params = len(param_list)
 
-    snowflake_conn_params = get_snowflake_connection()
-    client = APIClient(api_url=api_url)
-    buffer = pd.DataFrame()
+    snowflake_conn_params = get_snowflake_connection() if sink == "snowflake" else None
+
+    journal = None
+    if checkpoint_path:
+        if sink == "snowflake" and load_mode == "stage":
+            # W trybie 'stage' dane trafiają do tabeli dopiero przy COPY INTO na końcu przebiegu
+            logger.warning("Checkpointing is not supported with load_mode='stage'. Checkpoint disabled.")
+        else:
+            journal = CheckpointJournal(path=checkpoint_path, method=method, param_list=param_list)
+
+    def create_writer(stage_run_id: str = None) -> DataSink:
+        if sink == "parquet":
+            return ParquetSink(
+                root_dir=sink_path,
+                endpoint=method,
+                schema=client.builder[method].get_converter(compact=compact_schema).output_schema,
+                metrics=metrics
+            )
+        if sink == "null":
+            return NullSink(metrics=metrics)
+        # Import odroczony - snowflake.connector ładuje się długo, a sinki lokalne go nie potrzebują
+        from .class_SnowflakeWriter import SnowflakeWriter
+        return SnowflakeWriter(
+            conn_params=snowflake_conn_params,
+            table_name=table_name,
+            load_mode=load_mode,
+            metrics=metrics,
+            run_id=stage_run_id,
+            copy_on_close=stage_run_id is None
+        )
+
+    # Tryb 'stage' z zapisem w tle: wątki wrzucają pliki do wspólnego katalogu stage, jeden COPY INTO na końcu
+    stage_run_id = uuid.uuid4().hex if writer_threads > 0 and sink == "snowflake" and load_mode == "stage" else None
+    if writer_threads > 0:
+        # Zapis w tle - pobieranie i zapis do sinka nakładają się w czasie
+        logger.info(f"Write-behind mode: {writer_threads} writer thread(s), queue size {write_queue_size}.")
+        writer = WriteBehindWriter(
+            writer_factory=lambda: create_writer(stage_run_id=stage_run_id),
+            num_writers=writer_threads,
+            queue_size=write_queue_size
+        )
+    else:
+        writer = create_writer()
+    if buffer_spill_mb:
+        buffer = SpillingDataBuffer(
+            max_rows=buffer_size,
+            memory_budget=int(buffer_spill_mb * 1024 * 1024),
+            spill_dir=spill_dir,
+            metrics=metrics,
+            split_frames=journal is None
+        )
+        logger.info(f"Spilling buffer: {buffer_size} rows per load, {buffer_spill_mb} MB in memory, segments in {buffer.spill_dir}.")
+    else:
+        buffer = DataBuffer(
+            max_rows=buffer_size,
+            max_bytes=int(buffer_max_mb * 1024 * 1024) if buffer_max_mb else None,
+            # Z checkpointem fragmenty kończą się na granicy sub-requestu - nieudany fragment = całe sub-requesty do ponowienia
+            split_frames=journal is None
+        )
     file_idx = 1
 
+    deduplicator = None
+    if dedup:
+        natural_key = client.builder[method].get_natural_key()
+        if natural_key:
+            deduplicator = RowDeduplicator(natural_key, max_keys=dedup_max_keys, metrics=metrics)
+            logger.info(f"Deduplication on {natural_key}, remembering up to {dedup_max_keys} keys.")
+        else:
+            logger.warning(f"Endpoint '{method}' has no natural key, deduplication disabled.")
+
     if method == "intervals":
         delta_time = 60
     elif method in {"car_data", "location"}:
@@ -45,85 +284,279 @@ def fetch_and_buffer_data(
     else:
         delta_time = 360
 
+    slicer = AdaptiveSlicer(
+        initial_widths={method: delta_time},
+        target_rows=slice_target_rows,
+        state_path=slice_state_path
+    ) if adaptive_slicing else None
 
     logger.info(f"Starting API fetch for method '{method}'. Total requests: {total_params}")
+    # Linie per pod-zapytanie (formatowane leniwie, %-style) - przy log_every > 1 tylko na DEBUG
+    slice_level = logging.INFO if log_every <= 1 else logging.DEBUG
 
-    def generate_sub_requests(param_entry: dict, delta_time: int) -> list:
+    def sub_request_window(param_entry: dict, delta_time: int):
         """
-        Generate sub-requests for date range with delta_time intervals.
+        Returns (start, end, delta, count) of the date range split, or None if the entry is not split.
+        A range record may set its own slice width in seconds with 'step'.
         """
         if 'date_start' not in param_entry or 'date_end' not in param_entry:
-            return [param_entry]
-        
+            return None
         try:
             start = datetime.fromisoformat(param_entry['date_start'])
             end = datetime.fromisoformat(param_entry['date_end'])
-            delta = timedelta(seconds=delta_time)
-            sub_requests = []
-
-            current = start
-            while current < end:
-                next_end = min(current + delta, end)
-                sub_params = param_entry.copy()
-                sub_params['date_start'] = current.isoformat()
-                sub_params['date_end'] = next_end.isoformat()
-                sub_requests.append(sub_params)
-                current = next_end
-            return sub_requests or [param_entry]
         except ValueError as e:
             logger.error(f"Error parsing dates in param_entry: {param_entry}. Error: {e}")
-            return [param_entry]
+            return None
+        delta = timedelta(seconds=float(param_entry.get('step', delta_time)))
+        if start >= end or delta <= timedelta(0):
+            return None
+        return start, end, delta, math.ceil((end - start) / delta)
+
+    def generate_sub_requests(param_entry: dict, delta_time: int):
+        """
+        Lazily generates sub-requests for date range with delta_time intervals.
+        """
+        window = sub_request_window(param_entry, delta_time)
+        if window is None:
+            yield param_entry
+            return
+
+        start, end, delta, _ = window
+        current = start
+        while current < end:
+            next_end = min(current + delta, end)
+            sub_params = param_entry.copy()
+            sub_params['date_start'] = current.isoformat()
+            sub_params['date_end'] = next_end.isoformat()
+            yield sub_params
+            current = next_end
 
     def write_buffer_if_full() -> None:
         """
-        Write buffer to Snowflake if it reaches the buffer size and reset buffer.
-        # is memory size 
+        Write chunks of at most buffer_size rows to Snowflake while the buffer is full
+        (by row count or by memory size).
         """
-        nonlocal buffer, file_idx
-        #buffer_memory_size = buffer.memory_usage(deep=True).sum() / (1024 * 1024) # Mb
-        if len(buffer) >= buffer_size:
-            logger.info(f"Buffer reached {buffer_size} rows. Writing to Snowflake...")
-            write_to_snowflake(
-                df = buffer.iloc[:buffer_size],
-                #df = buffer,
-                conn_params = snowflake_conn_params,
-                table_name = table_name
-            )
-            logger.info(f"Chunk {file_idx} written to Snowflake ({buffer_size} rows).")
-            buffer = buffer.iloc[buffer_size:].reset_index(drop=True)
-            #buffer = buffer.iloc[0:0].reset_index(drop=True)  
-            file_idx += 1
-            
-        
+        while buffer.is_full():
+            logger.info(f"Buffer full ({len(buffer)} rows, {buffer.nbytes / (1024 * 1024):.1f} MB). Writing to {sink}...")
+            flush_buffer(max_rows=buffer_size)
+
+    def flush_buffer(max_rows: int = None) -> int:
+        """
+        Hands one flush to the writer as a single load (one chunk, or the spilled segments plus the
+        in-memory rows streamed one part at a time). Returns the number of rows handed over.
+        """
+        nonlocal file_idx
+        buffered = len(buffer)
+        with metrics.timer("buffer_concat"):
+            chunks = buffer.pop_chunks(max_rows=max_rows)
+        rows = buffered - len(buffer)
+        if not rows:
+            return 0
+        write_chunk(chunks, rows)
+        logger.info(f"Chunk {file_idx} handed to writer ({rows} rows).")
+        file_idx += 1
+        return rows
+
+    def write_chunk(chunks, rows: int) -> None:
+        """
+        Hands a flush to the writer and confirms it in the checkpoint journal once written.
+        """
+        # write_handoff = czas blokady pętli pobierania (cały zapis albo oczekiwanie na miejsce w kolejce)
+        with metrics.timer("write_handoff"):
+            hand_off(chunks, rows)
 
-    for idx, param_entry in enumerate(param_list, start=1):
-        logger.info(f"[{idx}/{total_params}] Processing parameter entry: {param_entry}")
-        sub_requests = generate_sub_requests(param_entry=param_entry, delta_time=delta_time)
-        sub_total = len(sub_requests)
+    def hand_off(chunks, rows: int) -> None:
+        if journal is None:
+            writer.write_many(chunks)
+            return
 
-        if sub_total > 1:
-            logger.info(f"[{idx}/{total_params}] Splitting into {sub_total} sub-requests.")
+        chunk_idx = file_idx
+        journal.record_chunk(chunk_idx, rows)
 
-        for sub_idx, sub_params in enumerate(sub_requests, 1):
-            log_prefix = f"[{idx}/{total_params}]" + (f" [{sub_idx}/{sub_total}]" if sub_total > 1 else "")
-            logger.info(f"{log_prefix} Fetching data with parameters: {sub_params}")
+        def on_done(success: bool) -> None:
+            if success:
+                journal.chunk_flushed(chunk_idx)
 
+        if writer_threads > 0:
+            writer.write_many(chunks, on_done=on_done)
+        else:
+            on_done(writer.write_many(chunks))
+
+    def iter_sub_requests():
+        """
+        Yields (log_prefix, param_entry, sub_params) for every sub-request, in params.json order.
+        """
+        for idx, param_entry in enumerate(param_list, start=1):
+            todo_entry = journal.resume_entry(param_entry) if journal is not None else param_entry
+            if todo_entry is None:
+                logger.info(f"[{idx}/{total_params}] Already loaded (checkpoint), skipping: {param_entry}")
+                continue
+            if todo_entry is not param_entry:
+                logger.info(f"[{idx}/{total_params}] Resuming from checkpoint at {todo_entry['date_start']}")
+
+            logger.info(f"[{idx}/{total_params}] Processing parameter entry: {param_entry}")
+            if slicer is not None:
+                # Liczba okien nie jest znana z góry - szerokość zmienia się w trakcie
+                for sub_idx, sub_params in enumerate(slicer.iter_windows(method, todo_entry), 1):
+                    if journal is not None and journal.is_flushed(param_entry, sub_params):
+                        continue
+                    yield f"[{idx}/{total_params}] [{sub_idx}]", param_entry, sub_params
+                continue
+
+            window = sub_request_window(todo_entry, delta_time)
+            sub_total = window[3] if window is not None else 1
+            sub_requests = generate_sub_requests(param_entry=todo_entry, delta_time=delta_time)
+
+            if sub_total > 1:
+                logger.info(f"[{idx}/{total_params}] Splitting into {sub_total} sub-requests.")
+
+            for sub_idx, sub_params in enumerate(sub_requests, 1):
+                if journal is not None and journal.is_flushed(param_entry, sub_params):
+                    # Okno zapisane w poprzednim przebiegu (za luką po nieudanym fragmencie)
+                    continue
+                log_prefix = f"[{idx}/{total_params}]" + (f" [{sub_idx}/{sub_total}]" if sub_total > 1 else "")
+                yield log_prefix, param_entry, sub_params
+
+    def fetch_sub_request(log_prefix: str, sub_params: dict) -> pd.DataFrame:
+        logger.log(slice_level, "%s Fetching data with parameters: %s", log_prefix, sub_params)
+        if slicer is None or 'date_end' not in sub_params:
+            return client.fetch_data(endpoint=method, params=sub_params)
+
+        session_key = sub_params.get('session_key')
+        width = slicer.window_seconds(sub_params)
+        try:
             df = client.fetch_data(endpoint=method, params=sub_params)
+        except (CircuitOpenError, ThrottledError):
+            # API nie odpowiada albo limit zapytań (429) - dzielenie okna nic nie da, a podwoiłoby liczbę zapytań
+            raise
+        except RuntimeError:
+            if not slicer.can_split(sub_params):
+                raise
+            # Zbyt szerokie okno (timeouty) - dzielimy na pół i pobieramy osobno
+            slicer.observe_failure(method, session_key, width)
+            halves = [fetch_sub_request(f"{log_prefix} [split]", half) for half in slicer.split_window(sub_params)]
+            return pd.concat(halves, ignore_index=True)
+
+        slicer.observe(method, session_key, width, rows=len(df))
+        return df
+
+    def iter_results():
+        """
+        Yields (log_prefix, param_entry, sub_params, df) in the same order as iter_sub_requests(),
+        regardless of fetch mode.
+        """
+        if fetch_mode == "sequential":
+            for log_prefix, param_entry, sub_params in iter_sub_requests():
+                api_calls = metrics.counter("api_calls")
+                yield log_prefix, param_entry, sub_params, fetch_sub_request(log_prefix, sub_params)
+                # Pauza tylko po zapytaniach do API - odpowiedzi z cache nie obciążają API
+                if metrics.counter("api_calls") > api_calls:
+                    metrics.count("sleep_seconds", 2)
+                    sleep(2)
+            return
+
+        # Tryb współbieżny - ograniczone okno zadań, wyniki odbierane w kolejności zgłoszenia
+        max_in_flight = max_workers * 2
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch") as executor:
+            in_flight = deque()
+            for log_prefix, param_entry, sub_params in iter_sub_requests():
+                future = executor.submit(fetch_sub_request, log_prefix, sub_params)
+                in_flight.append((log_prefix, param_entry, sub_params, future))
+                if len(in_flight) >= max_in_flight:
+                    log_prefix, param_entry, sub_params, future = in_flight.popleft()
+                    yield log_prefix, param_entry, sub_params, future.result()
+            while in_flight:
+                log_prefix, param_entry, sub_params, future = in_flight.popleft()
+                yield log_prefix, param_entry, sub_params, future.result()
+
+    if fetch_mode == "concurrent":
+        logger.info(f"Concurrent fetch mode: {max_workers} workers, {requests_per_second} requests/s.")
+
+    progress = {"entries_total": total_params, "entries_started": 0, "sub_requests": 0, "rows": 0}
+    last_entry = None
+
+    try:
+        for log_prefix, param_entry, sub_params, df in iter_results():
+            if param_entry is not last_entry:
+                progress["entries_started"] += 1
+                last_entry = param_entry
+            if coalesce_drivers:
+                df = planner.select_rows(method, param_entry, df)
+            progress["sub_requests"] += 1
+            fetched_rows = 0 if df is None else len(df)
+            progress["rows"] += fetched_rows
+            metrics.count("rows_fetched", fetched_rows)
+            if progress_callback is not None:
+                progress_callback(dict(progress))
+
+            if watermarks is not None:
+                df = watermarks.new_rows(param_entry, df)
+                for driver_entry, part in planner.fan_out(method, param_entry, df):
+                    watermarks.observe(driver_entry, part)
+            if deduplicator is not None:
+                df = deduplicator.filter(df)
+            if journal is not None:
+                journal.record_fetched(param_entry, sub_params, rows=0 if df is None else len(df))
             if df is not None and not df.empty:
-                buffer = pd.concat([buffer, df], ignore_index=True)
-                logger.info(f"Buffered {len(df)} rows. Current buffer size: {len(buffer)}")
+                buffer.append(df)
+                logger.log(slice_level, "Buffered %d rows. Current buffer size: %d", len(df), len(buffer))
                 write_buffer_if_full()
+            elif fetched_rows:
+                logger.log(slice_level, "%s All %d fetched rows already loaded, nothing to buffer.", log_prefix, fetched_rows)
             else:
-                logger.warning(f"{log_prefix} No data returned for parameters: {sub_params}")
+                logger.warning("%s No data returned for parameters: %s", log_prefix, sub_params)
+            if log_every > 1 and progress["sub_requests"] % log_every == 0:
+                logger.info(
+                    "%s %d sub-requests done, %d rows fetched, %d rows in buffer.",
+                    log_prefix, progress["sub_requests"], progress["rows"], len(buffer)
+                )
 
-            sleep(2)
+        if not buffer.empty:
+            logger.info(f"Writing remaining {len(buffer)} rows to {sink}...")
+            remaining = flush_buffer()
+            logger.info(f"Final {remaining} rows handed to writer.")
+        else:
+            logger.info("No remaining data in buffer to write.")
+    finally:
+        client.close()
+        try:
+            writer.close()
+        finally:
+            if stage_run_id is not None and file_idx > 1:
+                # Wszystkie wątki zakończone - jeden COPY INTO dla plików wszystkich writerów
+                copier = create_writer(stage_run_id=stage_run_id)
+                copier.copy_staged()
+                copier.close()
+            buffer.close()
+        if response_cache is not None:
+            metrics.count("cache_hits", response_cache.hits - cache_hits_start)
+            metrics.count("cache_misses", response_cache.misses - cache_misses_start)
+        metrics.log_summary()
+        if metrics_path:
+            metrics.write_json(metrics_path)
+        if metrics_prom_path:
+            metrics.write_prometheus(metrics_prom_path)
 
-    if not buffer.empty:
-        logger.info(f"Writing remaining {len(buffer)} rows to Snowflake...")
-        write_to_snowflake(df=buffer, conn_params=snowflake_conn_params, table_name=table_name)
-        logger.info(f"Final {len(buffer)} rows written to Snowflake.")
-    else:
-        logger.info("No remaining data in buffer to write.")
+    if journal is not None:
+        journal.complete()
+
+    if watermarks is not None:
+        # Znaczniki przesuwamy tylko, gdy wszystkie fragmenty zostały zapisane
+        if metrics.counter("write_failures"):
+            logger.warning(f"{metrics.counter('write_failures'):.0f} chunk write(s) failed, watermarks not advanced.")
+        else:
+            watermarks.save()
+
+    if slicer is not None:
+        slicer.save()
+
+    if response_cache is not None:
+        logger.info(
+            f"Response cache: {response_cache.hits - cache_hits_start} hits, "
+            f"{response_cache.misses - cache_misses_start} misses."
+        )
 
     logger.info("API fetch and write process completed.")
+    progress["metrics"] = metrics.summary()
+    return progress
         
\ No newline at end of file
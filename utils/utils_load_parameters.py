@@ -5,6 +5,8 @@ import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
+from .class_ParamStream import ParamStream
+
 logger = logging.getLogger(__name__)
 
 load_dotenv()  # załaduj .env
@@ -28,10 +30,21 @@ def get_parameters (input_path):
 
     try:
         logger.info("Odczyt pliku parametrów...")
+        if input_file.suffix == ".jsonl":
+            # JSON Lines: nagłówek w pierwszej linii, wpisy czytane leniwie przy każdym przebiegu
+            stream = ParamStream(input_file)
+            return {**stream.read_header(), "params": stream}
         with open(input_file, encoding="utf-8") as f:
             data = json.load(f)
     except json.JSONDecodeError as e:
         logger.error(f"Błąd w formacie JSON: {e}")
         sys.exit(1)
 
-    return data
\ No newline at end of file
+    return data
+
+
+def is_multi_endpoint(parameters):
+    """
+    True for run specs listing several endpoints ('runs' or 'methods') instead of a single 'method'.
+    """
+    return "runs" in parameters or "methods" in parameters
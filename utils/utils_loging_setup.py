@@ -1,14 +1,57 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
 import sys
 import os
 
-def setup_logging(log_mode="console"):
+from datetime import datetime, timezone
+
+# Wątek zapisujący logi w trybie asynchronicznym (None = logowanie synchroniczne)
+_listener = None
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line (timestamp, level, logger, thread, message), for log collectors.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that enqueues the record unformatted: the message (and any argument __repr__)
+    is built by the listener thread, not by the logging fetch thread.
+    The queue stays in-process, so records are never pickled.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def setup_logging(log_mode="console", async_logging=False, log_format="text"):
     """
     Configure logging based on the specified mode.
     - 'console': Logs to stdout (for testing in Docker).
     - 'file': Logs to a file (for production).
     - 'both': Logs to both stdout and file.
+
+    With async_logging the fetch threads only put records on an in-memory queue; a background
+    listener thread formats them and writes to stdout / app.log (drained by stop_logging() at exit).
+    log_format 'json' writes one JSON object per line instead of plain text.
     """
+    global _listener
+    stop_logging()
+
     # Podstawowa konfiguracja loggera
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)  # Poziom logowania
@@ -18,25 +61,56 @@ def setup_logging(log_mode="console"):
 
     # Format logów
     #log_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    log_format = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    if log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
+    handlers = []
     # Konfiguracja handlerów na podstawie trybu
     if log_mode == "console" or log_mode == "both":
         console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(log_format)
-        logger.addHandler(console_handler)
+        console_handler.setFormatter(formatter)
+        handlers.append(console_handler)
         # Wymuś flush dla natychmiastowego wyświetlania
         console_handler.flush = sys.stdout.flush
 
     if log_mode == "file" or log_mode == "both":
         file_handler = logging.FileHandler('app.log')
-        file_handler.setFormatter(log_format)
-        logger.addHandler(file_handler)
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
 
     # W przypadku nieprawidłowego trybu, domyślnie loguj do konsoli
     if log_mode not in ["console", "file", "both"]:
-        logging.warning(f"Nieprawidłowy tryb logowania: {log_mode}. Ustawiam domyślnie 'console'.")
         console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(log_format)
-        logger.addHandler(console_handler)
-        console_handler.flush = sys.stdout.flush
\ No newline at end of file
+        console_handler.setFormatter(formatter)
+        handlers.append(console_handler)
+        console_handler.flush = sys.stdout.flush
+
+    if async_logging:
+        # Wątki pobierające tylko wrzucają rekord do kolejki - formatowanie i zapis w wątku listenera
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(DeferredQueueHandler(log_queue))
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
+
+    if log_mode not in ["console", "file", "both"]:
+        logging.warning("Nieprawidłowy tryb logowania: %s. Ustawiam domyślnie 'console'.", log_mode)
+
+def stop_logging():
+    """
+    Drains the log queue and stops the listener thread (no-op in synchronous mode).
+    Must be called before a worker process exits, atexit handlers do not run there.
+    """
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.flush()
+
+atexit.register(stop_logging)
@@ -0,0 +1,171 @@
+# Przebiegi wielu endpointów w jednym procesie - kolejność warstw (Tier 1 -> 5.2), endpointy warstwy równolegle
+import logging
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .class_APIClient import APIClient
+from .class_APIRequestBuilder import ENDPOINT_REGISTRY
+from .class_RetryPolicy import CircuitOpenError, RetryPolicy
+from .class_TokenBucket import TokenBucket
+from .utils_fetch_and_buffer_data import fetch_and_buffer_data
+from .utils_load_parameters import get_parameters
+
+# Inicjalizacja loggera
+logger = logging.getLogger(__name__)
+
+
+def split_run_spec(parameters: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Normalizes a params.json spec to a list of single-endpoint specs ({"method", "params" | "plan"}).
+
+    Accepted forms:
+        {"method": ..., "params" | "plan": ...}               - single endpoint
+        {"runs": [{"method": ..., "params" | "plan": ...}]}   - own parameters per endpoint
+        {"methods": [...], "params" | "plan": ...}            - the same parameters for every endpoint
+    """
+    if "runs" in parameters:
+        runs = list(parameters["runs"])
+    elif "methods" in parameters:
+        shared = {k: v for k, v in parameters.items() if k != "methods"}
+        runs = [{**shared, "method": method} for method in parameters["methods"]]
+    else:
+        runs = [parameters]
+
+    seen = set()
+    for run in runs:
+        method = run.get("method")
+        if method not in ENDPOINT_REGISTRY:
+            raise ValueError(f"Unknown endpoint in run spec: {method}")
+        if "params" not in run and "plan" not in run:
+            raise ValueError(f"Run spec for '{method}' needs 'params' or 'plan'")
+        if method in seen:
+            # Jedna tabela docelowa = jeden writer - wpisy endpointu należy połączyć w jednym 'params'/'plan'
+            raise ValueError(f"Endpoint '{method}' listed more than once in run spec")
+        seen.add(method)
+    return runs
+
+
+def schedule_by_tier(runs: List[Dict[str, Any]]) -> List[Tuple[float, List[Dict[str, Any]]]]:
+    """
+    Groups runs by the tier of their endpoint, in ascending tier order (metadata before telemetry).
+    """
+    tiers: Dict[float, List[Dict[str, Any]]] = {}
+    for run in runs:
+        tiers.setdefault(ENDPOINT_REGISTRY[run["method"]].tier, []).append(run)
+    return sorted(tiers.items())
+
+
+def endpoint_path(path: Optional[str], method: str) -> Optional[str]:
+    """
+    Per-endpoint variant of a per-run file path (checkpoint, metrics), e.g. run.json -> run.laps.json.
+    """
+    if not path:
+        return path
+    target = Path(path)
+    return str(target.with_name(f"{target.stem}.{method}{target.suffix}"))
+
+
+def fetch_endpoints(
+    param_file_path: str,
+    api_url: str,
+    max_parallel_endpoints: int = 4,
+    fetch_mode: str = "sequential",
+    max_workers: int = 4,
+    requests_per_second: float = 3.0,
+    retry_policy: RetryPolicy = None,
+    checkpoint_path: str = None,
+    metrics_path: str = None,
+    metrics_prom_path: str = None,
+    **fetch_kwargs
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Runs fetch_and_buffer_data for every endpoint of a multi-endpoint spec in one process.
+    Tiers run in order (Tier 1 meetings ... Tier 5.2 car_data/location); endpoints of the same tier run
+    concurrently and share one HTTP connection pool, one rate limit and one retry policy (429 pause,
+    circuit breaker). Every endpoint keeps its own buffer and writer (one per BRONZE_<METHOD> table).
+
+    Args:
+        param_file_path (str): Path to the parameter file (see split_run_spec for the accepted forms).
+        api_url (str): API URL for data fetching.
+        max_parallel_endpoints (int, optional): Max endpoints of a tier fetched at the same time. Defaults to 4.
+        fetch_mode (str, optional): Fetch mode of every endpoint. Defaults to 'sequential'.
+        max_workers (int, optional): Fetch workers per endpoint (concurrent mode). Defaults to 4.
+        requests_per_second (float, optional): API call rate shared by all endpoints (concurrent mode). Defaults to 3.
+        retry_policy (RetryPolicy, optional): Shared retry rules. Defaults to None (RetryPolicy()).
+        checkpoint_path (str, optional): Checkpoint file, one per endpoint (run.jsonl -> run.<method>.jsonl).
+            Defaults to None.
+        metrics_path (str, optional): Run summary JSON, one per endpoint. Defaults to None.
+        metrics_prom_path (str, optional): Prometheus textfile, one per endpoint. Defaults to None.
+        **fetch_kwargs: Other arguments passed to fetch_and_buffer_data for every endpoint.
+    Returns:
+        dict: Run summary per endpoint ({"failed": error} for failed endpoints).
+    """
+    runs = split_run_spec(get_parameters(input_path=param_file_path))
+    tiers = schedule_by_tier(runs)
+    retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+    max_parallel = max(1, min(max_parallel_endpoints, max(len(tier_runs) for _, tier_runs in tiers)))
+    session = APIClient.create_session(pool_size=max_parallel * max(max_workers, 1))
+    rate_limiter = TokenBucket(rate=requests_per_second) if fetch_mode == "concurrent" else None
+
+    logger.info(
+        f"Multi-endpoint run: {len(runs)} endpoint(s) in {len(tiers)} tier(s), "
+        f"up to {max_parallel} endpoint(s) in parallel."
+    )
+    results: Dict[str, Dict[str, Any]] = {}
+    start = time.perf_counter()
+    try:
+        for tier, tier_runs in tiers:
+            methods = [run["method"] for run in tier_runs]
+            logger.info(f"Tier {tier:g}: {', '.join(methods)}")
+            tier_start = time.perf_counter()
+            circuit_open = None
+            with ThreadPoolExecutor(max_workers=min(max_parallel, len(tier_runs)), thread_name_prefix="endpoint") as executor:
+                futures = {
+                    executor.submit(
+                        fetch_and_buffer_data,
+                        param_file_path=param_file_path,
+                        api_url=api_url,
+                        parameters=run,
+                        fetch_mode=fetch_mode,
+                        max_workers=max_workers,
+                        requests_per_second=requests_per_second,
+                        retry_policy=retry_policy,
+                        checkpoint_path=endpoint_path(checkpoint_path, run["method"]),
+                        metrics_path=endpoint_path(metrics_path, run["method"]),
+                        metrics_prom_path=endpoint_path(metrics_prom_path, run["method"]),
+                        session=session,
+                        rate_limiter=rate_limiter,
+                        **fetch_kwargs
+                    ): run["method"]
+                    for run in tier_runs
+                }
+                for future in as_completed(futures):
+                    method = futures[future]
+                    try:
+                        results[method] = future.result()
+                        logger.info(f"[{method}] finished: {results[method]['rows']} rows.")
+                    except CircuitOpenError as e:
+                        circuit_open = e
+                        results[method] = {"failed": str(e)}
+                        logger.error(f"[{method}] aborted, API unavailable: {e}")
+                    except Exception as e:
+                        results[method] = {"failed": str(e)}
+                        logger.error(f"[{method}] failed: {e}")
+            logger.info(f"Tier {tier:g} done in {time.perf_counter() - tier_start:.1f}s.")
+            if circuit_open is not None:
+                # API niedostępne - kolejne warstwy nie mają sensu
+                raise circuit_open
+    finally:
+        session.close()
+
+    failed = sorted(method for method, result in results.items() if "failed" in result)
+    logger.info(
+        f"Multi-endpoint run finished in {time.perf_counter() - start:.1f}s: "
+        f"{len(results) - len(failed)} endpoint(s) loaded, {len(failed)} failed."
+    )
+    if failed:
+        raise RuntimeError(f"Endpoints failed: {failed}")
+    return results
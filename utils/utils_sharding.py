@@ -0,0 +1,171 @@
+# Podział params.json na shardy i uruchamianie ich w wielu procesach
+import hashlib
+import json
+import logging
+import multiprocessing
+import queue
+import time
+
+from typing import Any, Dict, List, Sequence
+
+# Inicjalizacja loggera
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD_BY = ("session_key", "driver_number")
+
+
+def shard_of(param_entry: Dict[str, Any], shard_count: int, shard_by: Sequence[str] = DEFAULT_SHARD_BY) -> int:
+    """
+    Deterministic shard index of a parameter entry: stable hash of the shard_by values modulo shard_count.
+    Entries with the same shard_by values always land in the same shard.
+    """
+    key = json.dumps([param_entry.get(k) for k in shard_by], default=str)
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest(), 16) % shard_count
+
+
+def shard_param_list(
+    param_list: List[Dict[str, Any]],
+    shard_index: int,
+    shard_count: int,
+    shard_by: Sequence[str] = DEFAULT_SHARD_BY
+) -> List[Dict[str, Any]]:
+    """
+    Returns the entries of param_list belonging to shard_index. Shards are disjoint and together cover param_list.
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard_index must be in [0, {shard_count}), got {shard_index}")
+    return [entry for entry in param_list if shard_of(entry, shard_count, shard_by) == shard_index]
+
+
+def shard_path(path: str, shard_index: int, shard_count: int) -> str:
+    """
+    Per-shard variant of a state file path (checkpoint, slice widths), so that shards never share a file.
+    """
+    if not path or shard_count <= 1:
+        return path
+    return f"{path}.shard{shard_index}of{shard_count}"
+
+
+def shard_rate(requests_per_second: float, shard_count: int) -> float:
+    """
+    Per-shard share of the API rate limit: shards run side by side against the same API,
+    so together they must stay within requests_per_second.
+    """
+    return requests_per_second / max(1, shard_count)
+
+
+def _run_shard(shard_index: int, shard_count: int, progress_queue, log_options: Dict[str, Any], fetch_kwargs: Dict[str, Any]) -> None:
+    """
+    Entry point of a shard worker process.
+    """
+    from .utils_fetch_and_buffer_data import fetch_and_buffer_data
+    from .utils_loging_setup import setup_logging, stop_logging
+
+    setup_logging(**log_options)
+
+    def report(progress: Dict[str, Any]) -> None:
+        progress_queue.put((shard_index, progress))
+
+    try:
+        summary = fetch_and_buffer_data(
+            shard_index=shard_index,
+            shard_count=shard_count,
+            progress_callback=report,
+            **fetch_kwargs
+        )
+        progress_queue.put((shard_index, {**summary, "finished": True}))
+    except BaseException as e:
+        progress_queue.put((shard_index, {"failed": str(e)}))
+        raise
+    finally:
+        stop_logging()
+
+
+def run_sharded(
+    shard_count: int,
+    instance_index: int = 0,
+    instance_count: int = 1,
+    log_mode: str = "console",
+    async_logging: bool = False,
+    log_format: str = "text",
+    report_interval: float = 10.0,
+    **fetch_kwargs
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Coordinator: runs fetch_and_buffer_data for every shard in a separate process
+    (own APIClient, buffer and writer per process) and logs per-shard progress.
+    Combined with instance sharding (instance_index of instance_count task instances) the two levels compose:
+    process i of instance k runs global shard k * shard_count + i of instance_count * shard_count.
+    requests_per_second is the combined limit of all shards of all instances - each process gets
+    1/(instance_count * shard_count) of it.
+
+    Args:
+        shard_count (int): Number of shards = number of worker processes.
+        instance_index (int, optional): Shard of this task instance (0-based). Defaults to 0.
+        instance_count (int, optional): Number of task instances running side by side. Defaults to 1.
+        log_mode (str, optional): Logging mode for worker processes. Defaults to 'console'.
+        async_logging (bool, optional): Queue-backed logging in worker processes. Defaults to False.
+        log_format (str, optional): 'text' or 'json' log lines in worker processes. Defaults to 'text'.
+        report_interval (float, optional): Seconds between progress reports. Defaults to 10.
+        **fetch_kwargs: Arguments passed to fetch_and_buffer_data in every shard.
+    Returns:
+        dict: Last reported progress per shard.
+    """
+    if not 0 <= instance_index < instance_count:
+        raise ValueError(f"instance_index must be in [0, {instance_count}), got {instance_index}")
+    total_shards = instance_count * shard_count
+    first_shard = instance_index * shard_count
+    rate = fetch_kwargs.get("requests_per_second", 3.0)
+    fetch_kwargs = {**fetch_kwargs, "requests_per_second": shard_rate(rate, total_shards)}
+    ctx = multiprocessing.get_context("spawn")
+    log_options = {"log_mode": log_mode, "async_logging": async_logging, "log_format": log_format}
+    progress_queue = ctx.Queue()
+    processes = {
+        i: ctx.Process(
+            target=_run_shard,
+            args=(i, total_shards, progress_queue, log_options, fetch_kwargs),
+            name=f"shard-{i}"
+        )
+        for i in range(first_shard, first_shard + shard_count)
+    }
+    progress: Dict[int, Dict[str, Any]] = {i: {} for i in processes}
+
+    logger.info(
+        f"Starting {shard_count} shard processes (shards {first_shard}-{first_shard + shard_count - 1} of {total_shards}), "
+        f"{fetch_kwargs['requests_per_second']:.2f} requests/s each ({rate} in total)."
+    )
+    for process in processes.values():
+        process.start()
+
+    def drain(timeout: float) -> None:
+        try:
+            shard_index, update = progress_queue.get(timeout=timeout)
+            progress[shard_index].update(update)
+            while True:
+                shard_index, update = progress_queue.get_nowait()
+                progress[shard_index].update(update)
+        except queue.Empty:
+            pass
+
+    last_report = time.monotonic()
+    while any(p.is_alive() for p in processes.values()):
+        drain(timeout=1.0)
+        if time.monotonic() - last_report >= report_interval:
+            for i, state in progress.items():
+                logger.info(
+                    f"[shard {i}/{total_shards}] entries {state.get('entries_started', 0)}/{state.get('entries_total', '?')}, "
+                    f"sub-requests {state.get('sub_requests', 0)}, rows {state.get('rows', 0)}"
+                )
+            last_report = time.monotonic()
+    drain(timeout=0.1)
+
+    failed = []
+    for i, process in processes.items():
+        process.join()
+        if process.exitcode != 0:
+            failed.append(i)
+        logger.info(f"[shard {i}/{total_shards}] exit code {process.exitcode}, rows {progress[i].get('rows', 0)}")
+
+    if failed:
+        raise RuntimeError(f"Shards failed: {failed}")
+    return progress